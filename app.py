@@ -1,15 +1,23 @@
+import asyncio
+import importlib.util
+import json
 import logging
+import multiprocessing
 import os
+import queue
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple
 
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, HttpUrl, Field, model_validator
 
-from video_chunks_generator import LocalVideoProcessor, VideoChunker, logger
+from video_chunks_generator import LocalVideoProcessor, VideoChunker, cuda_device_count, logger
 from create_vector_store import RAGVectorStoreManager, CreateCollectionRequest
-from query_manager import QueryManager
+from query_manager import get_query_manager
+from job_store import JobStore, get_redis_client
 
 class DirectoryRequest(BaseModel):
     """Request model for directory processing."""
@@ -42,21 +50,110 @@ class AnswerResponse(BaseModel):
     source_documents: List[SourceDocument]
 
 
+class JobCreatedResponse(BaseModel):
+    """Response model for a queued background job."""
+    task_id: str
+    status: str
+
+
 # FastAPI Application
 app = FastAPI(
     title="Video RAG Pipeline API",
     description="API for processing videos and creating RAG vector collections",
-    version="3.1.0"
+    version="3.1.0",
+    default_response_class=ORJSONResponse
 )
 
+job_store = JobStore(redis_client=get_redis_client())
+
+
+def _warm_query_managers(base_persist_directory: str = "./rag_collections") -> None:
+    """Open the query managers of all existing collections so first requests skip initialization."""
+    try:
+        # DirEntry.is_dir() answers from the directory listing, no stat() per entry
+        with os.scandir(base_persist_directory) as entries:
+            collection_names = [entry.name for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return
+
+    for collection_name in collection_names:
+        try:
+            get_query_manager(collection_name)
+            logger.info(f"Warmed query manager for collection '{collection_name}'")
+        except Exception as e:
+            logger.warning(f"Could not warm collection '{collection_name}': {e}")
+
+
+@app.on_event("startup")
+async def warm_collections_on_startup():
+    await asyncio.to_thread(_warm_query_managers)
+
+# Per-process transcription state, created once by each pool worker in _init_video_worker.
+_worker_processor: Optional[LocalVideoProcessor] = None
+_worker_chunker: Optional[VideoChunker] = None
+
+
+# Whisper is memory-heavy; more CPU workers than this mostly fight over memory bandwidth.
+MAX_CPU_TRANSCRIBE_WORKERS = 4
+
+
+def _init_video_worker(gpu_ids: Optional[Any] = None) -> None:
+    """Load the Whisper model once per worker process, pinned to its own GPU when GPUs are used."""
+    global _worker_processor, _worker_chunker
+    if gpu_ids is not None:
+        try:
+            # Must be set before CUDA is initialized in this process.
+            os.environ["CUDA_VISIBLE_DEVICES"] = str(gpu_ids.get(timeout=10))
+        except queue.Empty:
+            # A replacement worker after a crash finds the queue drained; it keeps all GPUs visible.
+            logger.warning("No GPU id left for transcription worker; using default device selection")
+    _worker_processor = LocalVideoProcessor()
+    _worker_chunker = VideoChunker()
+
+
+def get_transcribe_worker_count(video_count: int, gpu_count: int) -> int:
+    """One worker per GPU, otherwise min(CPU, 4); TRANSCRIBE_WORKERS overrides both."""
+    configured = os.getenv("TRANSCRIBE_WORKERS")
+    if configured:
+        limit = max(1, int(configured))
+    elif gpu_count:
+        limit = gpu_count
+    else:
+        limit = min(os.cpu_count() or 1, MAX_CPU_TRANSCRIBE_WORKERS)
+    return max(1, min(video_count, limit))
+
+
+def _process_single_file_pure(video_file: Path) -> Tuple[List[Dict[str, Any]], str, bool]:
+    """Transcribe and chunk a single video file. Returns (chunks, filename, ok)."""
+    logger.info(f"Processing: {video_file}")
+
+    transcript_segments, video_title, video_id = _worker_processor.get_transcript(str(video_file))
+
+    if not transcript_segments:
+        logger.warning(f"No transcript for '{video_file.name}', skipping")
+        return [], video_file.name, False
+
+    chunks = _worker_chunker.chunk_transcript(transcript_segments, video_id, video_title)
+
+    if not chunks:
+        logger.warning(f"No chunks created for '{video_file.name}', skipping")
+        return [], video_file.name, False
+
+    logger.info(f"Successfully processed '{video_file.name}' - {len(chunks)} chunks added")
+    return chunks, video_file.name, True
+
 
 class VideoProcessingService:
     """Service class for video processing operations."""
     
     SUPPORTED_VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi', '.webm')
     @classmethod
-    def process_directory(cls, directory_path: str) -> Dict[str, Any]:
-        """Process all videos in a directory."""
+    def process_directory(
+        cls,
+        directory_path: str,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> Dict[str, Any]:
+        """Process all videos in a directory, optionally reporting per-video progress."""
         directory = Path(directory_path)
         
         if not directory.exists() or not directory.is_dir():
@@ -68,17 +165,17 @@ class VideoProcessingService:
         collection_name = directory.name
         logger.info(f"Auto-generated collection name: '{collection_name}'")
 
-        processor = LocalVideoProcessor()
-        video_chunker = VideoChunker()
-        
         all_chunks = []
         processed_files = []
         failed_files = []
 
-        video_files = [
-            f for f in directory.iterdir() 
-            if f.is_file() and f.suffix.lower() in cls.SUPPORTED_VIDEO_EXTENSIONS
-        ]
+        # DirEntry carries the file type from the directory read, so no stat() per entry is needed.
+        with os.scandir(directory) as entries:
+            video_files = [
+                Path(entry.path) for entry in entries
+                if entry.is_file()
+                and entry.name.lower().endswith(cls.SUPPORTED_VIDEO_EXTENSIONS)
+            ]
 
         if not video_files:
             raise HTTPException(
@@ -88,15 +185,49 @@ class VideoProcessingService:
 
         logger.info(f"Processing {len(video_files)} videos from '{directory_path}'")
 
-        for video_file in video_files:
-            try:
-                cls._process_single_file(
-                    video_file, processor, video_chunker, 
-                    all_chunks, processed_files, failed_files
-                )
-            except Exception as e:
-                logger.error(f"Error processing '{video_file.name}': {e}")
-                failed_files.append(video_file.name)
+        # Videos are independent, so they are transcribed in parallel worker processes.
+        # "spawn" avoids inheriting CUDA state from the parent via fork.
+        mp_context = multiprocessing.get_context("spawn")
+        gpu_count = cuda_device_count()
+        max_workers = get_transcribe_worker_count(len(video_files), gpu_count)
+
+        gpu_ids = None
+        if gpu_count:
+            # Each worker takes one GPU id from the queue in _init_video_worker.
+            gpu_ids = mp_context.Queue()
+            for worker_index in range(max_workers):
+                gpu_ids.put(worker_index % gpu_count)
+
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=mp_context,
+            initializer=_init_video_worker,
+            initargs=(gpu_ids,)
+        ) as executor:
+            futures = {
+                executor.submit(_process_single_file_pure, video_file): video_file
+                for video_file in video_files
+            }
+            for future in as_completed(futures):
+                video_file = futures[future]
+                try:
+                    chunks, filename, ok = future.result()
+                    if ok:
+                        all_chunks.extend(chunks)
+                        processed_files.append(filename)
+                    else:
+                        failed_files.append(filename)
+                except Exception as e:
+                    logger.error(f"Error processing '{video_file.name}': {e}")
+                    failed_files.append(video_file.name)
+
+                if progress_callback:
+                    progress_callback({
+                        "total_videos": len(video_files),
+                        "processed_video_count": len(processed_files),
+                        "failed_video_count": len(failed_files),
+                        "current_file": video_file.name
+                    })
 
         if not all_chunks:
             raise HTTPException(
@@ -116,41 +247,50 @@ class VideoProcessingService:
                 "failed_files": failed_files
             }
         }
-    
-    @staticmethod
-    def _process_single_file(video_file, processor, video_chunker, all_chunks, processed_files, failed_files):
-        """Process a single video file."""
-        logger.info(f"Processing: {video_file}")
-        
-        transcript_segments, video_title, video_id = processor.get_transcript(str(video_file))
-        
-        if not transcript_segments:
-            logger.warning(f"No transcript for '{video_file.name}', skipping")
-            failed_files.append(video_file.name)
-            return
-
-        chunks = video_chunker.chunk_transcript(transcript_segments, video_id, video_title)
-        
-        if not chunks:
-            logger.warning(f"No chunks created for '{video_file.name}', skipping")
-            failed_files.append(video_file.name)
-            return
 
-        all_chunks.extend(chunks)
-        processed_files.append(video_file.name)
-        logger.info(f"Successfully processed '{video_file.name}' - {len(chunks)} chunks added")
 
-
-@app.post("/process_directory_for_rag", response_model=Dict[str, Any])
-async def process_directory_for_rag(request: DirectoryRequest):
-    """Process all videos in a directory for RAG."""
+def run_directory_job(task_id: str, directory_path: str) -> None:
+    """Background job body for `/process_directory_for_rag`."""
+    job_store.update(task_id, status="running")
     try:
-        return VideoProcessingService.process_directory(request.directory_path)
-    except HTTPException:
-        raise
+        result = VideoProcessingService.process_directory(
+            directory_path,
+            progress_callback=lambda progress: job_store.update(task_id, progress=progress)
+        )
+        job_store.update(task_id, status="completed", result=result)
+        logger.info(f"Job '{task_id}' completed for '{directory_path}'")
+    except HTTPException as e:
+        logger.error(f"Job '{task_id}' failed: {e.detail}")
+        job_store.update(task_id, status="failed", error=e.detail)
     except Exception as e:
-        logger.exception(f"Unexpected error during directory processing: {e}")
-        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+        logger.exception(f"Unexpected error in job '{task_id}': {e}")
+        job_store.update(task_id, status="failed", error=str(e))
+
+
+@app.post("/process_directory_for_rag", response_model=JobCreatedResponse)
+async def process_directory_for_rag(request: DirectoryRequest, background_tasks: BackgroundTasks):
+    """Queue processing of all videos in a directory for RAG and return the job id."""
+    directory = Path(request.directory_path)
+    if not directory.exists() or not directory.is_dir():
+        raise HTTPException(
+            status_code=404,
+            detail=f"Directory not found: {request.directory_path}"
+        )
+
+    task_id = job_store.create(directory_path=request.directory_path)
+    background_tasks.add_task(run_directory_job, task_id, request.directory_path)
+    logger.info(f"Queued directory processing job '{task_id}' for '{request.directory_path}'")
+
+    return JobCreatedResponse(task_id=task_id, status="queued")
+
+
+@app.get("/jobs/{task_id}", response_model=Dict[str, Any])
+async def get_job(task_id: str):
+    """Return status, progress and (when finished) the result of a background job."""
+    job = await asyncio.to_thread(job_store.get, task_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {task_id}")
+    return job
 
 
 @app.post("/create_collection", response_model=CreateCollectionResponse)
@@ -160,9 +300,8 @@ async def create_vector_store(request: CreateCollectionRequest):
         collection_path = Path(request.base_persist_directory) / request.collection_name
         logger.info(f"Creating collection '{request.collection_name}' at: {collection_path}")
         
-        rag_manager = RAGVectorStoreManager(persist_directory=str(collection_path))
-        chunks_as_dicts = [chunk.dict() for chunk in request.chunks]
-        rag_manager.create_and_persist_store(chunks_as_dicts)
+        rag_manager = await asyncio.to_thread(RAGVectorStoreManager, persist_directory=str(collection_path))
+        await rag_manager.acreate_and_persist_store(request.chunks)
         
         return CreateCollectionResponse(
             status="success",
@@ -179,8 +318,8 @@ async def create_vector_store(request: CreateCollectionRequest):
 async def ask_question(request: QuestionRequest):
     """Ask a question against a collection."""
     try:
-        query_manager = QueryManager(collection_name=request.collection_name)
-        result = query_manager.ask(request.question)
+        query_manager = await asyncio.to_thread(get_query_manager, request.collection_name)
+        result = await query_manager.aask(request.question)
         
         return AnswerResponse(
             answer=result["answer"],
@@ -198,11 +337,69 @@ async def ask_question(request: QuestionRequest):
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 
+def _sse_event(event: str, data: Any) -> str:
+    """Format a single Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/ask_stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    Ask a question and stream the answer as Server-Sent Events.
+    Emits `token` events with answer deltas, one `sources` event and a final `done` event.
+    """
+    try:
+        query_manager = await asyncio.to_thread(get_query_manager, request.collection_name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Error preparing streamed answer: {e}")
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+    async def event_stream():
+        try:
+            async for event in query_manager.ask_stream(request.question):
+                if "delta" in event:
+                    yield _sse_event("token", {"delta": event["delta"]})
+                else:
+                    yield _sse_event("sources", [
+                        SourceDocument(page_content=doc.page_content, metadata=doc.metadata).model_dump()
+                        for doc in event["source_documents"]
+                    ])
+            yield _sse_event("done", {})
+        except Exception as e:
+            logger.exception(f"Error streaming answer: {e}")
+            yield _sse_event("error", {"detail": f"Server error: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+def get_worker_count() -> int:
+    """
+    Worker count for uvicorn: WEB_CONCURRENCY if set, otherwise 2 * CPU + 1.
+    Without REDIS_URL the job store lives in process memory, so a job queued on one worker would
+    be invisible to /jobs requests served by another; a single worker is used in that case.
+    """
+    web_concurrency = os.getenv("WEB_CONCURRENCY")
+    workers = max(1, int(web_concurrency)) if web_concurrency else max(2, (os.cpu_count() or 1) * 2 + 1)
+    if workers > 1 and not os.getenv("REDIS_URL"):
+        logger.warning(f"REDIS_URL is not set; running 1 worker instead of {workers} so job state stays consistent")
+        return 1
+    return workers
+
+
+def get_event_loop_name() -> str:
+    """uvloop when it is installed (Linux/macOS), otherwise the default asyncio loop."""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
 if __name__ == '__main__':
     uvicorn.run(
         "app:app", 
         host='0.0.0.0', 
         port=5001, 
         reload=False, 
+        workers=get_worker_count(),
+        loop=get_event_loop_name(),
         log_level="info"
-    )
\ No newline at end of file
+    )
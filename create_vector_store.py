@@ -1,13 +1,23 @@
 import os
+import asyncio
+import gc
+import hashlib
 import logging
-from typing import List, Dict, Any
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from operator import attrgetter, itemgetter
+from typing import List, Dict, Any, Sequence, Tuple, Union
+import numpy as np
 from pydantic import BaseModel, Field
 
 # Import ChromaDB and LangChain libraries
 import chromadb
+from langchain_core.embeddings import Embeddings
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores.chroma import Chroma
 from dotenv import load_dotenv
+from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
 
 # Load environment variables (e.g., GOOGLE_API_KEY from .env file)
 load_dotenv()
@@ -16,6 +26,40 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Same name LangChain's Chroma wrapper uses by default, so QueryManager finds the collection.
+COLLECTION_NAME = "langchain"
+
+# HNSW index settings applied when a collection is created. Gemini embeddings are compared by
+# cosine similarity; the larger graph degree / ef values keep recall high for the k=3, fetch_k=20 MMR retriever.
+COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
+# Persistent text -> embedding cache shared by all collections; unchanged chunks are not re-embedded on re-ingest.
+# Kept outside rag_collections/ so deleting the collections on a model switch leaves the cache in place.
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(".cache", "embeddings.sqlite"))
+
+# Embedding backend shared by ingestion and querying: "gemini" (API, default) or "huggingface" (local
+# sentence-transformers model). Collections must be queried with the backend/model they were built with.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini").strip().lower()
+DEFAULT_EMBEDDING_MODELS = {
+    "gemini": "models/embedding-001",
+    "huggingface": "sentence-transformers/all-MiniLM-L6-v2",
+}
+if EMBEDDING_BACKEND not in DEFAULT_EMBEDDING_MODELS:
+    raise ValueError(f"Unsupported EMBEDDING_BACKEND '{EMBEDDING_BACKEND}'. Use one of: {', '.join(DEFAULT_EMBEDDING_MODELS)}")
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL") or DEFAULT_EMBEDDING_MODELS[EMBEDDING_BACKEND]
+
+# Number of chunks embedded per mega-batch; bounds the memory held for texts + vectors.
+EMBEDDING_MEGA_BATCH_SIZE = 5000
+# Maximum number of embedding requests in flight at once during ingestion.
+EMBEDDING_MAX_INFLIGHT = int(os.getenv("EMBEDDING_MAX_INFLIGHT", "8"))
+# Number of records written to ChromaDB per upsert call.
+CHROMA_WRITE_BATCH_SIZE = 500
+
 # --- Pydantic Models (API Request and Response Structures) ---
 
 class ChunkMetadata(BaseModel):
@@ -38,6 +82,232 @@ class CreateCollectionRequest(BaseModel):
     chunks: List[ChunkModel]
     base_persist_directory: str = Field("./rag_collections", description="The main directory where collections will be saved.")
 
+# --- Chunk Preparation ---
+
+_CHUNK_FIELDS = ('text', 'start_ms', 'end_ms', 'chunk_index', 'metadata')
+_METADATA_FIELDS = ('video_id', 'video_title', 'timestamp_link')
+
+# Chunks arrive either as ChunkModel instances (/create_collection) or as plain dicts (VideoChunker output).
+_DICT_GETTERS = (itemgetter(*_CHUNK_FIELDS), itemgetter(*_METADATA_FIELDS))
+_MODEL_GETTERS = (attrgetter(*_CHUNK_FIELDS), attrgetter(*_METADATA_FIELDS))
+
+
+def flatten_chunks(
+    chunks: Sequence[Union[ChunkModel, Dict[str, Any]]]
+) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """
+    Split chunks into the parallel ids / texts / metadatas lists ChromaDB expects, in one pass.
+    Ids are derived from (video_id, source, chunk_index) so re-running an ingestion upserts instead of duplicating.
+    The source is video_title, which is the file name for local videos: two files whose names slugify to the
+    same video_id (e.g. "Ders 1.mp4" and "ders-1.mp4") would otherwise share ids and overwrite each other.
+    """
+    chunk_fields, metadata_fields = _MODEL_GETTERS if chunks and isinstance(chunks[0], ChunkModel) else _DICT_GETTERS
+
+    ids, texts, metadatas = [], [], []
+    source_hashes: Dict[str, str] = {}
+    for text, start_ms, end_ms, chunk_index, metadata in map(chunk_fields, chunks):
+        video_id, video_title, timestamp_link = metadata_fields(metadata)
+        source_hash = source_hashes.get(video_title)
+        if source_hash is None:
+            source_hash = source_hashes[video_title] = hashlib.sha1(video_title.encode("utf-8")).hexdigest()[:12]
+        ids.append(f"{video_id}:{source_hash}:{chunk_index}")
+        texts.append(text)
+        metadatas.append({
+            "video_id": video_id,
+            "video_title": video_title,
+            "timestamp_link": timestamp_link,
+            "start_ms": start_ms,
+            "end_ms": end_ms,
+            "chunk_index": chunk_index
+        })
+    return ids, texts, metadatas
+
+
+def normalize_embeddings(embeddings: List[List[float]]) -> np.ndarray:
+    """
+    Pack embeddings into one contiguous float32 matrix with unit-length rows.
+    hnswlib stores float32 anyway, so this drops the per-float Python object overhead of the
+    nested lists during ingestion, and unit vectors make the cosine distance a plain dot product.
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.maximum(norms, np.finfo(np.float32).tiny, out=norms)
+    matrix /= norms
+    return matrix
+
+
+def create_embedding_client() -> Embeddings:
+    """
+    Embedding client for the configured EMBEDDING_BACKEND / EMBEDDING_MODEL.
+    The HuggingFace backend runs locally (GPU when available) and is imported only when selected.
+    """
+    if EMBEDDING_BACKEND == "huggingface":
+        try:
+            import torch
+            from langchain_huggingface import HuggingFaceEmbeddings
+        except ImportError as e:
+            raise ImportError(
+                f"EMBEDDING_BACKEND=huggingface requires langchain-huggingface, sentence-transformers and torch "
+                f"({e.name} is missing). Install them with: pip install -r requirements-huggingface.txt"
+            ) from e
+
+        return HuggingFaceEmbeddings(
+            model_name=EMBEDDING_MODEL_NAME,
+            model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"},
+            encode_kwargs={"normalize_embeddings": True, "batch_size": 64}
+        )
+    return GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL_NAME, transport="grpc")
+
+
+# --- Embedding Rate Limiting ---
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Token-bucket wrapper around an embeddings client.
+    Texts are sent in batches of `batch_size`; every batch is one API request and consumes one token,
+    which keeps large ingestions under the requests-per-minute quota instead of running into 429s.
+    """
+    def __init__(self, embeddings: Embeddings, requests_per_minute: int = 1500, batch_size: int = 100):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self._rate = requests_per_minute / 60.0
+        self._capacity = max(1.0, self._rate)
+        self._tokens = self._capacity
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> None:
+        """Block until a request token is available."""
+        while True:
+            # Only the bucket update is locked; sleeping under the lock would serialize every waiting thread.
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._capacity, self._tokens + (now - self._last_refill) * self._rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self._rate
+            time.sleep(wait_seconds)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            self._acquire()
+            vectors.extend(self.embeddings.embed_documents(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        self._acquire()
+        return self.embeddings.embed_query(text)
+
+    async def _aembed_batch(self, texts: List[str], semaphore: asyncio.Semaphore) -> List[List[float]]:
+        async with semaphore:
+            # Retries (e.g. 429 / transient 5xx) back off exponentially and each attempt takes a new token.
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(5), wait=wait_random_exponential(multiplier=1, max=30), reraise=True
+            ):
+                with attempt:
+                    await asyncio.to_thread(self._acquire)
+                    return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str], max_inflight: int = EMBEDDING_MAX_INFLIGHT) -> List[List[float]]:
+        """
+        Embed texts in concurrent batches. Texts are sorted by length so each request carries
+        similarly sized inputs; results are put back into the original order.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        batches = [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+        semaphore = asyncio.Semaphore(max_inflight)
+        results = await asyncio.gather(
+            *(self._aembed_batch([texts[i] for i in batch], semaphore) for batch in batches)
+        )
+
+        vectors: List[List[float]] = [None] * len(texts)
+        for batch, batch_vectors in zip(batches, results):
+            for index, vector in zip(batch, batch_vectors):
+                vectors[index] = vector
+        return vectors
+
+
+# --- Persistent Embedding Cache ---
+
+class DiskCachedEmbeddings(Embeddings):
+    """
+    SQLite-backed cache in front of an embeddings client. Keys are sha256(model + "\0" + text);
+    vectors are stored as float32 BLOBs. Only texts missing from the cache are sent to the wrapped client.
+    Rows returned from the cache are float32 numpy arrays rather than lists.
+    """
+    # Stay below SQLite's default bound-parameter limit for the IN (...) lookups.
+    _LOOKUP_BATCH_SIZE = 500
+
+    def __init__(self, embeddings: Embeddings, model_name: str, db_path: str = EMBEDDING_CACHE_PATH):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS emb_cache ("
+                "hash TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vec BLOB NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # A short-lived connection per call: ingestion runs in worker threads and several processes share the file.
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _hash(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, np.ndarray]:
+        cached: Dict[str, np.ndarray] = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(hashes), self._LOOKUP_BATCH_SIZE):
+                lookup = hashes[start:start + self._LOOKUP_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(lookup))
+                rows = conn.execute(
+                    f"SELECT hash, vec FROM emb_cache WHERE hash IN ({placeholders})", lookup
+                ).fetchall()
+                for row_hash, blob in rows:
+                    cached[row_hash] = np.frombuffer(blob, dtype=np.float32)
+        return cached
+
+    def _store(self, hashes: List[str], vectors: List[List[float]], cached: Dict[str, np.ndarray]) -> None:
+        rows = []
+        for row_hash, vector in zip(hashes, vectors):
+            array = np.asarray(vector, dtype=np.float32)
+            cached[row_hash] = array
+            rows.append((row_hash, self.model_name, array.shape[0], array.tobytes()))
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO emb_cache (hash, model, dim, vec) VALUES (?, ?, ?, ?)", rows)
+
+    def _prepare(self, texts: List[str]) -> Tuple[List[str], Dict[str, np.ndarray], List[str], List[str]]:
+        """Returns (hash per text, cached vectors, missing hashes, missing texts)."""
+        hashes = [self._hash(text) for text in texts]
+        text_by_hash = dict(zip(hashes, texts))
+        cached = self._lookup(list(text_by_hash))
+        miss_hashes = [h for h in text_by_hash if h not in cached]
+        logger.info(f"Embedding cache: {len(texts) - len(miss_hashes)} hits, {len(miss_hashes)} texts sent to the API.")
+        return hashes, cached, miss_hashes, [text_by_hash[h] for h in miss_hashes]
+
+    def embed_documents(self, texts: List[str]) -> List[Any]:
+        hashes, cached, miss_hashes, miss_texts = self._prepare(texts)
+        if miss_texts:
+            self._store(miss_hashes, self.embeddings.embed_documents(miss_texts), cached)
+        return [cached[h] for h in hashes]
+
+    async def aembed_documents(self, texts: List[str]) -> List[Any]:
+        hashes, cached, miss_hashes, miss_texts = await asyncio.to_thread(self._prepare, texts)
+        if miss_texts:
+            vectors = await self.embeddings.aembed_documents(miss_texts)
+            await asyncio.to_thread(self._store, miss_hashes, vectors, cached)
+        return [cached[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
 # --- Vector Database Management Class ---
 
 class RAGVectorStoreManager:
@@ -49,25 +319,43 @@ class RAGVectorStoreManager:
         Args:
             persist_directory (str): The full path where the ChromaDB collection will be saved to disk.
         """
-        if not os.getenv("GOOGLE_API_KEY"):
+        if EMBEDDING_BACKEND == "gemini" and not os.getenv("GOOGLE_API_KEY"):
             raise ValueError("GOOGLE_API_KEY environment variable not found. Please check your .env file.")
         
         self.persist_directory = persist_directory
         
-        logger.info("Initializing Google Generative AI embedding model...")
-        self.embedding_function = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+        logger.info(f"Initializing {EMBEDDING_BACKEND} embedding model '{EMBEDDING_MODEL_NAME}'...")
+        embedding_client = create_embedding_client()
+        if EMBEDDING_BACKEND == "gemini":
+            # Only the API backend has a requests-per-minute quota to respect.
+            embedding_client = RateLimitedEmbeddings(
+                embedding_client,
+                requests_per_minute=int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "1500"))
+            )
+        self.embedding_function = DiskCachedEmbeddings(embedding_client, model_name=EMBEDDING_MODEL_NAME)
         logger.info("Embedding model initialized successfully.")
         
         # Configure the Chroma client for persistent storage
         self.client = chromadb.PersistentClient(path=self.persist_directory)
         logger.info(f"ChromaDB client configured for path '{self.persist_directory}'.")
 
-    def create_and_persist_store(self, chunks: List[Dict[str, Any]]):
+    def create_and_persist_store(self, chunks: Sequence[Union[ChunkModel, Dict[str, Any]]]):
         """
         Creates the vector store using the given list of chunks and saves it to disk.
+        Synchronous wrapper for worker threads; inside an event loop await `acreate_and_persist_store` instead.
+        
+        Args:
+            chunks: A list of ChunkModel instances or dictionaries, each containing text and metadata.
+        """
+        # One event loop for the whole ingestion keeps the async Gemini client bound to a single loop.
+        asyncio.run(self.acreate_and_persist_store(chunks))
+
+    async def acreate_and_persist_store(self, chunks: Sequence[Union[ChunkModel, Dict[str, Any]]]):
+        """
+        Async version of `create_and_persist_store`; embedding batches run concurrently on the caller's loop.
         
         Args:
-            chunks (List[Dict[str, Any]]): A list of dictionaries, each containing text and metadata.
+            chunks: A list of ChunkModel instances or dictionaries, each containing text and metadata.
         """
         if not chunks:
             logger.warning("No chunks found to add to the vector store. Skipping operation.")
@@ -75,27 +363,33 @@ class RAGVectorStoreManager:
 
         logger.info(f"Creating vector store for '{self.persist_directory}'. Number of chunks to add: {len(chunks)}")
 
-        # Separate texts and metadatas for LangChain's Chroma.from_texts method
-        texts = [chunk['text'] for chunk in chunks]
-        metadatas = [
-            {
-                "video_id": chunk['metadata']['video_id'],
-                "video_title": chunk['metadata']['video_title'],
-                "timestamp_link": chunk['metadata']['timestamp_link'],
-                "start_ms": chunk['start_ms'],
-                "end_ms": chunk['end_ms'],
-                "chunk_index": chunk['chunk_index']
-            }
-            for chunk in chunks
-        ]
-
-        # Create the vector store and save it to the specified path
-        # This process creates the embeddings and writes both the embeddings and metadatas to ChromaDB.
-        vector_store = Chroma.from_texts(
-            texts=texts,
-            embedding=self.embedding_function,
-            metadatas=metadatas,
-            persist_directory=self.persist_directory
+        # ChromaDB calls are blocking disk I/O, so they stay off the event loop.
+        collection = await asyncio.to_thread(
+            self.client.get_or_create_collection, name=COLLECTION_NAME, metadata=COLLECTION_METADATA
         )
-        
-        logger.info(f"Vector store successfully created and saved to '{self.persist_directory}'.")
\ No newline at end of file
+        await self._aembed_and_upsert(collection, chunks)
+
+        logger.info(f"Vector store successfully created and saved to '{self.persist_directory}'.")
+
+    async def _aembed_and_upsert(self, collection, chunks: Sequence[Union[ChunkModel, Dict[str, Any]]]) -> None:
+        # Embed in large batches and write to ChromaDB (upsert) in smaller ones.
+        for batch_start in range(0, len(chunks), EMBEDDING_MEGA_BATCH_SIZE):
+            batch = chunks[batch_start:batch_start + EMBEDDING_MEGA_BATCH_SIZE]
+
+            ids, texts, metadatas = flatten_chunks(batch)
+
+            embeddings = normalize_embeddings(await self.embedding_function.aembed_documents(texts))
+
+            for write_start in range(0, len(batch), CHROMA_WRITE_BATCH_SIZE):
+                write_end = write_start + CHROMA_WRITE_BATCH_SIZE
+                await asyncio.to_thread(
+                    collection.upsert,
+                    ids=ids[write_start:write_end],
+                    embeddings=embeddings[write_start:write_end],
+                    metadatas=metadatas[write_start:write_end],
+                    documents=texts[write_start:write_end]
+                )
+
+            logger.info(f"Stored chunks {batch_start + 1}-{batch_start + len(batch)} of {len(chunks)}.")
+            del batch, ids, texts, metadatas, embeddings
+            gc.collect()
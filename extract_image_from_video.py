@@ -1,6 +1,10 @@
 import os
+import io
 import logging
-from typing import Optional
+import shutil
+import subprocess
+from functools import lru_cache
+from typing import Optional, Tuple
 from pathlib import Path
 
 import cv2
@@ -8,47 +12,147 @@ from PIL import Image
 
 logger = logging.getLogger(__name__)
 
+FFMPEG_BINARY = shutil.which("ffmpeg")
 
-def get_frame_from_video(video_path: str, timestamp_ms: int) -> Optional[Image.Image]:
+def _default_hwaccel() -> str:
+    """NVDEC ("cuda") when CTranslate2 sees a CUDA device, as for Whisper; otherwise software decode ("")."""
+    try:
+        import ctranslate2
+        return "cuda" if ctranslate2.get_cuda_device_count() > 0 else ""
+    except Exception:
+        return ""
+
+# ffmpeg hardware decoder for frame extraction. Unset: NVDEC on hosts with a CUDA device, software decode elsewhere.
+# "auto" lets ffmpeg pick NVDEC/VAAPI/..., "cuda", "vaapi" etc. force one and an empty value disables it.
+# Decoded frames are downloaded to system memory (no -hwaccel_output_format) since the mjpeg encoder runs on the CPU.
+FRAME_HWACCEL = os.getenv("FRAME_HWACCEL")
+FRAME_HWACCEL = _default_hwaccel() if FRAME_HWACCEL is None else FRAME_HWACCEL.strip()
+
+
+class FrameExtractionError(Exception):
+    """Raised when a frame cannot be decoded; keeps failures out of the frame cache."""
+
+
+def _run_ffmpeg_frame(video_path: str, timestamp_ms: int, hwaccel: str = "") -> bytes:
+    # "-ss" before "-i" seeks on the input side: ffmpeg jumps to the nearest keyframe
+    # and decodes only up to the requested timestamp instead of reading from the start.
+    command = [FFMPEG_BINARY, "-loglevel", "error"]
+    if hwaccel:
+        command += ["-hwaccel", hwaccel]
+    command += [
+        "-ss", f"{timestamp_ms / 1000:.3f}",
+        "-i", video_path,
+        "-frames:v", "1",
+        "-f", "image2pipe", "-vcodec", "mjpeg", "-"
+    ]
+    proc = subprocess.run(command, capture_output=True, timeout=30)
+    if proc.returncode != 0 or not proc.stdout:
+        raise FrameExtractionError(proc.stderr.decode("utf-8", errors="replace").strip() or "no frame decoded")
+    return proc.stdout
+
+
+def _extract_jpeg_with_ffmpeg(video_path: str, timestamp_ms: int) -> bytes:
+    if FRAME_HWACCEL:
+        try:
+            return _run_ffmpeg_frame(video_path, timestamp_ms, FRAME_HWACCEL)
+        except FrameExtractionError as e:
+            # Unsupported codec/driver on the GPU: decode this frame on the CPU instead.
+            logger.warning(f"Hardware decode ({FRAME_HWACCEL}) failed, falling back to software decode: {e}")
+    return _run_ffmpeg_frame(video_path, timestamp_ms)
+
+
+def _extract_jpeg_with_opencv(video_path: str, timestamp_ms: int) -> bytes:
+    cap = cv2.VideoCapture(video_path)
+
+    if not cap.isOpened():
+        raise FrameExtractionError(f"Cannot open video file: {video_path}")
+
+    try:
+        cap.set(cv2.CAP_PROP_POS_MSEC, timestamp_ms)
+        ret, frame = cap.read()
+
+        if not ret:
+            raise FrameExtractionError(f"Cannot extract frame at {timestamp_ms}ms")
+
+        # imencode expects BGR, which is what OpenCV decodes to
+        ok, encoded = cv2.imencode(".jpg", frame)
+        if not ok:
+            raise FrameExtractionError("JPEG encoding failed")
+        return encoded.tobytes()
+    finally:
+        cap.release()
+
+
+@lru_cache(maxsize=256)
+def _extract_jpeg_cached(video_path: str, timestamp_ms: int, mtime_ns: int) -> bytes:
+    # mtime_ns is part of the cache key only, so a replaced video file is decoded again.
+    if FFMPEG_BINARY:
+        return _extract_jpeg_with_ffmpeg(video_path, timestamp_ms)
+    return _extract_jpeg_with_opencv(video_path, timestamp_ms)
+
+
+@lru_cache(maxsize=256)
+def _downscaled_jpeg_cached(video_path: str, timestamp_ms: int, mtime_ns: int,
+                            max_size: Tuple[int, int], quality: int) -> bytes:
+    # Resize + re-encode is costlier than the lookup, so the final bytes are cached, not only the decode.
+    image = Image.open(io.BytesIO(_extract_jpeg_cached(video_path, timestamp_ms, mtime_ns))).convert("RGB")
+    image.thumbnail(max_size, Image.LANCZOS)
+    buffered = io.BytesIO()
+    image.save(buffered, format="jpeg", quality=quality, optimize=True, progressive=False)
+    return buffered.getvalue()
+
+
+def get_frame_bytes_from_video(video_path: str, timestamp_ms: int,
+                               max_size: Optional[Tuple[int, int]] = None, quality: int = 80) -> Optional[bytes]:
     """
-    Extract frame from video at specified timestamp.
-    
+    Extract the frame at the specified timestamp as JPEG bytes.
+
     Args:
         video_path: Full path to video file
         timestamp_ms: Timestamp in milliseconds
-        
+        max_size: If given, the frame is downscaled to fit and re-encoded at `quality`
+
     Returns:
-        PIL Image object if successful, None otherwise
+        JPEG encoded frame if successful, None otherwise
     """
     video_file = Path(video_path)
-    
-    if not video_file.exists():
-        logger.error(f"Video file not found: {video_path}")
-        return None
 
-    cap = cv2.VideoCapture(video_path)
-    
-    if not cap.isOpened():
-        logger.error(f"Cannot open video file: {video_path}")
+    try:
+        mtime_ns = os.stat(video_path).st_mtime_ns
+    except FileNotFoundError:
+        logger.error(f"Video file not found: {video_path}")
         return None
 
     try:
-        cap.set(cv2.CAP_PROP_POS_MSEC, timestamp_ms)
-        ret, frame = cap.read()
-        
-        if not ret:
-            logger.warning(f"Cannot extract frame at {timestamp_ms}ms from '{video_file.name}'")
-            return None
-            
-        logger.info(f"Successfully extracted frame at {timestamp_ms}ms from '{video_file.name}'")
-        
-        # Convert BGR to RGB for PIL/Gemini compatibility
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        return Image.fromarray(frame_rgb)
-        
+        if max_size:
+            jpeg_bytes = _downscaled_jpeg_cached(video_path, int(timestamp_ms), mtime_ns, tuple(max_size), quality)
+        else:
+            jpeg_bytes = _extract_jpeg_cached(video_path, int(timestamp_ms), mtime_ns)
+    except FrameExtractionError as e:
+        logger.warning(f"Cannot extract frame at {timestamp_ms}ms from '{video_file.name}': {e}")
+        return None
     except Exception as e:
         logger.exception(f"Error extracting frame from video: {e}")
         return None
-        
-    finally:
-        cap.release()
\ No newline at end of file
+
+    logger.info(f"Successfully extracted frame at {timestamp_ms}ms from '{video_file.name}'")
+    return jpeg_bytes
+
+
+def get_frame_from_video(video_path: str, timestamp_ms: int) -> Optional[Image.Image]:
+    """
+    Extract frame from video at specified timestamp.
+
+    Args:
+        video_path: Full path to video file
+        timestamp_ms: Timestamp in milliseconds
+
+    Returns:
+        PIL Image object (RGB) if successful, None otherwise
+    """
+    jpeg_bytes = get_frame_bytes_from_video(video_path, timestamp_ms)
+    if jpeg_bytes is None:
+        return None
+
+    image = Image.open(io.BytesIO(jpeg_bytes))
+    return image.convert("RGB")
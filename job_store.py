@@ -0,0 +1,85 @@
+import os
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+JOB_TTL_SECONDS = 24 * 60 * 60
+
+
+def get_redis_client():
+    """Return a Redis client if REDIS_URL is configured, otherwise None."""
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        return None
+
+    import redis
+    return redis.Redis.from_url(redis_url)
+
+
+class JobStore:
+    """
+    Keeps the state of background jobs (status, progress, result).
+    State is stored in Redis when a client is given so that every worker sees it;
+    otherwise it lives in process memory. Either way a job expires JOB_TTL_SECONDS after its last update.
+    """
+
+    def __init__(self, redis_client=None, key_prefix: str = "sterk:job:v2:"):
+        self._redis = redis_client
+        self._key_prefix = key_prefix
+        # job_id -> (expires_at, job), oldest write first so expired jobs are dropped from the front.
+        self._jobs: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, job_id: str) -> str:
+        return f"{self._key_prefix}{job_id}"
+
+    def _write(self, job_id: str, fields: Dict[str, Any]) -> None:
+        if self._redis is not None:
+            # One hash field per job field: HSET merges atomically on the server, so progress written by
+            # several workers at once is never lost to a read-modify-write race.
+            pipe = self._redis.pipeline(transaction=True)
+            pipe.hset(self._key(job_id), mapping={name: json.dumps(value) for name, value in fields.items()})
+            pipe.expire(self._key(job_id), JOB_TTL_SECONDS)
+            pipe.execute()
+            return
+        now = time.monotonic()
+        with self._lock:
+            _, job = self._jobs.pop(job_id, (None, {}))
+            job.update(fields)
+            self._jobs[job_id] = (now + JOB_TTL_SECONDS, job)
+            while self._jobs:
+                oldest_id, (expires_at, _) = next(iter(self._jobs.items()))
+                if expires_at > now:
+                    break
+                del self._jobs[oldest_id]
+
+    def create(self, **fields: Any) -> str:
+        """Create a new queued job and return its id."""
+        job_id = str(uuid.uuid4())
+        self._write(job_id, {"task_id": job_id, "status": "queued", "created_at": time.time(), **fields})
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self._redis is not None:
+            raw = self._redis.hgetall(self._key(job_id))
+            if not raw:
+                return None
+            return {
+                (name.decode() if isinstance(name, bytes) else name): json.loads(value)
+                for name, value in raw.items()
+            }
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None or entry[0] <= time.monotonic():
+                return None
+            return dict(entry[1])
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        """Merge the given fields into the stored job."""
+        self._write(job_id, {"task_id": job_id, **fields, "updated_at": time.time()})
@@ -1,72 +1,80 @@
 import os
 import logging
-import uuid
-from typing import List, Dict, Any, Optional, Tuple
+import re
+from typing import AsyncIterator, ClassVar, List, Dict, Any, Optional, Tuple, Union
 from pathlib import Path
+import asyncio
 import base64
-import io
-from PIL import Image
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+import chromadb
+import numpy as np
+from slugify import slugify
 import time
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage
-from langchain_community.vectorstores.chroma import Chroma
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
-from extract_image_from_video import get_frame_from_video
+from extract_image_from_video import get_frame_bytes_from_video
+from job_store import get_redis_client
+from create_vector_store import COLLECTION_NAME, create_embedding_client
 
 logger = logging.getLogger(__name__)
 
 
+# Canonical lowercase 8-4-4-4-12 form, the same strings str(uuid.UUID(...)) produces.
+_UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
 def is_valid_uuid(uuid_str: str) -> bool:
     """Check if a string is a valid UUID."""
-    try:
-        uuid_obj = uuid.UUID(uuid_str)
-        return str(uuid_obj) == uuid_str
-    except (ValueError, AttributeError):
-        return False
+    return isinstance(uuid_str, str) and _UUID_RE.fullmatch(uuid_str) is not None
 
 def find_latest_collection_uuid(collection_path: Path) -> Optional[str]:
     """
     Find the most recent UUID subdirectory in the collection path.
     Returns the UUID string if found, None otherwise.
     """
-    if not collection_path.exists():
+    try:
+        with os.scandir(collection_path) as entries:
+            # entry.stat() reuses the scandir result where the platform provides it
+            uuid_dirs = [(entry.stat().st_mtime, entry.name) for entry in entries
+                         if entry.is_dir() and is_valid_uuid(entry.name)]
+    except (FileNotFoundError, NotADirectoryError):
         return None
     
-    uuid_dirs = [d for d in collection_path.iterdir() if d.is_dir() and is_valid_uuid(d.name)]
-    
     if not uuid_dirs:
         return None
     
-    # Sort by directory creation time (newest first)
-    uuid_dirs.sort(key=lambda d: d.stat().st_mtime, reverse=True)
-    return uuid_dirs[0].name
+    # Newest directory by modification time
+    return max(uuid_dirs)[1]
 
 def is_valid_collection(collection_path: Path) -> bool:
     """
     Check if a collection path contains a valid ChromaDB collection.
     """
-    if not collection_path.exists() or not collection_path.is_dir():
-        return False
-    
     # Önce doğrudan collection_path'te chroma.sqlite3 var mı kontrol et
-    if (collection_path / "chroma.sqlite3").exists():
+    if os.path.isfile(os.path.join(collection_path, "chroma.sqlite3")):
         return True
     
-    # UUID alt dizinlerini kontrol et
-    uuid_dirs = [d for d in collection_path.iterdir() if d.is_dir() and is_valid_uuid(d.name)]
-    
-    for uuid_dir in uuid_dirs:
-        if (uuid_dir / "chroma.sqlite3").exists():
-            return True
+    # UUID alt dizinlerini aynı taramada kontrol et, ilk bulunan yeterli
+    try:
+        with os.scandir(collection_path) as entries:
+            for entry in entries:
+                if entry.is_dir() and is_valid_uuid(entry.name) \
+                        and os.path.isfile(os.path.join(entry.path, "chroma.sqlite3")):
+                    return True
+    except (FileNotFoundError, NotADirectoryError):
+        return False
     
     return False
 
 def get_collection_dir(collection_name: str) -> Path:
     """Get the collection directory path, checking both slugified and original names."""
-    from slugify import slugify
-    
     base = Path("./rag_collections")
     slug = slugify(collection_name)
     slug_dir = base / slug
@@ -89,47 +97,261 @@ def get_collection_dir(collection_name: str) -> Path:
     logger.info(f"No valid collection found, will use slug_dir: {slug_dir}")
     return slug_dir
 
+def get_collection_statuses(collection_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Batch form of get_collection_dir + is_valid_collection + find_latest_collection_uuid.
+    The collections root is listed once; only directories matching a requested name are opened.
+    """
+    try:
+        with os.scandir("./rag_collections") as entries:
+            collection_dirs = {entry.name: entry.path for entry in entries if entry.is_dir()}
+    except (FileNotFoundError, NotADirectoryError):
+        collection_dirs = {}
+
+    statuses = {}
+    for collection_name in collection_names:
+        status = {"exists": False, "uuid": None}
+        # Same precedence as get_collection_dir: slugified name first, then the original name
+        for dir_name in (slugify(collection_name), collection_name):
+            path = collection_dirs.get(dir_name)
+            if path and is_valid_collection(path):
+                status = {"exists": True, "uuid": find_latest_collection_uuid(path)}
+                break
+        statuses[collection_name] = status
+    return statuses
+
 def find_original_dir_name(collection_name: str) -> str:
     """Find the original directory name for a given collection name."""
-    # Import VIDEO_LIST from web_api_service to get the correct mapping
+    # web_api_service keeps the collection -> directory map built from VIDEO_LIST
     try:
-        from web_api_service import VIDEO_LIST
-        for video in VIDEO_LIST:
-            if video.get("collection_name") == collection_name:
-                return video.get("original_dir_name", collection_name)
+        from web_api_service import COLLECTION_TO_DIR
+        original_dir_name = COLLECTION_TO_DIR.get(collection_name)
+        if original_dir_name:
+            return original_dir_name
     except ImportError:
         pass
     
     # Fallback: check the actual directory structure
-    education_dir = Path("Education_video")
-    if education_dir.exists():
-        for dir_path in education_dir.iterdir():
-            if dir_path.is_dir() and dir_path.name.lower().replace(" ", "_") == collection_name:
-                return dir_path.name
+    try:
+        with os.scandir("Education_video") as entries:
+            for entry in entries:
+                if entry.is_dir() and entry.name.lower().replace(" ", "_") == collection_name:
+                    return entry.name
+    except FileNotFoundError:
+        pass
     
     return collection_name
 
-def pil_to_base64(image: Image.Image, format: str = "jpeg") -> str:
-    """Convert PIL Image to base64 string."""
-    buffered = io.BytesIO()
-    image.save(buffered, format=format)
-    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-    return f"data:image/{format};base64,{img_str}"
+def mmr_select(query_embedding: List[float], embeddings: Any, k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal marginal relevance over the fetched candidates.
+    Query-doc and doc-doc cosine similarities are computed once as matrices; each step only
+    updates the running "closest already-selected" vector instead of recomputing pairs.
+    """
+    candidates = np.asarray(embeddings, dtype=np.float32)
+    if candidates.size == 0 or k <= 0:
+        return []
+    query = np.asarray(query_embedding, dtype=np.float32)
+
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    sim_query = candidates @ query
+    sim_docs = candidates @ candidates.T
+
+    k = min(k, len(candidates))
+    selected = [int(np.argmax(sim_query))]
+    is_selected = np.zeros(len(candidates), dtype=bool)
+    is_selected[selected[0]] = True
+    max_sim_selected = sim_docs[:, selected[0]].copy()
+
+    while len(selected) < k:
+        scores = lambda_mult * sim_query - (1 - lambda_mult) * max_sim_selected
+        scores[is_selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        is_selected[best] = True
+        np.maximum(max_sim_selected, sim_docs[:, best], out=max_sim_selected)
+    return selected
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding. A new question whose cosine similarity to a cached one
+    exceeds `threshold` reuses that answer and skips retrieval and the LLM call.
+    Vectors live in a preallocated float32 ring buffer, so a lookup is one matrix-vector product.
+    Entries older than `ttl_seconds` are ignored; callers get copies, never the cached dicts.
+    """
+
+    def __init__(self, threshold: float = 0.95, maxsize: int = 512, ttl_seconds: float = 60 * 60):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._vectors: Optional[np.ndarray] = None
+        self._stored_at = np.zeros(maxsize, dtype=np.float64)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * maxsize
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / max(float(np.linalg.norm(vector)), 1e-9)
+
+    @staticmethod
+    def _copy(result: Dict[str, Any]) -> Dict[str, Any]:
+        copied = dict(result)
+        if "source_documents" in copied:
+            copied["source_documents"] = list(copied["source_documents"])
+        return copied
+
+    def get(self, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        query = self._normalize(embedding)
+        with self._lock:
+            if not self._size:
+                return None
+            scores = self._vectors[:self._size] @ query
+            scores[self._stored_at[:self._size] < time.monotonic() - self.ttl_seconds] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            return self._copy(self._entries[best])
+
+    def put(self, embedding: List[float], result: Dict[str, Any]) -> None:
+        vector = self._normalize(embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+            self._vectors[self._next] = vector
+            self._stored_at[self._next] = time.monotonic()
+            self._entries[self._next] = self._copy(result)
+            self._next = (self._next + 1) % self.maxsize
+            self._size = min(self._size + 1, self.maxsize)
+
+    def clear(self) -> None:
+        """Forget every answer, e.g. after the collection behind them was rebuilt."""
+        with self._lock:
+            self._entries = [None] * self.maxsize
+            self._size = 0
+            self._next = 0
+
+@lru_cache(maxsize=None)
+def get_shared_llm() -> ChatGoogleGenerativeAI:
+    """
+    One Gemini chat client per process. Every QueryManager reuses its gRPC channel,
+    so concurrent /ask calls are multiplexed over one HTTP/2 connection instead of
+    each collection opening its own TLS session.
+    """
+    return ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3, transport="grpc")
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings adapter that memoizes embed_query. Questions are keyed after strip/lower,
+    so a repeated question skips the embedding API round-trip entirely; the model itself
+    always embeds the question as it was asked.
+    """
+
+    def __init__(self, embeddings: Embeddings, maxsize: int = 1024):
+        self._embeddings = embeddings
+        self._maxsize = maxsize
+        self._cache: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text.strip().lower()
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                return list(vector)
+        # Outside the lock: the API call must not serialize unrelated questions.
+        vector = tuple(self._embeddings.embed_query(text))
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            if len(self._cache) > self._maxsize:
+                self._cache.popitem(last=False)
+        return list(vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embeddings.embed_documents(texts)
+
+@lru_cache(maxsize=None)
+def get_shared_embeddings() -> CachedEmbeddings:
+    """One embedding client per process (EMBEDDING_BACKEND), shared the same way as the chat client."""
+    return CachedEmbeddings(create_embedding_client())
+
+# Gemini vision downsamples images to roughly this size, so larger frames only add upload bytes.
+FRAME_MAX_SIZE = (768, 768)
 
 
 class QueryManager:
     """Multimodal RAG query manager for video-based question answering."""
 
-    def __init__(self, collection_name: str, base_persist_directory: str = "./rag_collections"):
+    RETRIEVAL_K = 3
+    RETRIEVAL_FETCH_K = 20
+    RETRIEVAL_CACHE_TTL_SECONDS = 60 * 60
+    # Frame cache granularity; a half-second shift does not change what the frame shows.
+    FRAME_BUCKET_MS = 500
+    # Cosine similarity above which a previous answer is reused for a new question.
+    SEMANTIC_CACHE_THRESHOLD = 0.95
+    # Upper bound on in-flight Gemini calls for aask_many.
+    ASK_MANY_CONCURRENCY = 8
+
+    # Static instruction prompt; only {context} and {question} are filled in per request.
+    # Literal braces in the text would need doubling for format_map.
+    PROMPT_TEMPLATE: ClassVar[str] = """You are "EğitimBot," an expert educational assistant. Your primary purpose is to provide clear and helpful answers to students using information strictly from the provided video transcripts.
+
+            PERSONA:
+            - A patient and supportive teacher
+            - Professional yet warm
+            - Focused on student learning
+
+            ---
+            *CORE TASK & RULES*
+
+            *RULE #1: PRIMARY TASK - Answering from Video Content*
+            If the user's question is related to the provided video content, you MUST follow these rules:
+            - Answer ONLY with information from the SOURCE DOCUMENTS. Do not use external knowledge.
+            - Start your response directly with the Turkish phrase: "Eğitim içeriğimize göre...."
+            - Summarize the main point in 1-2 sentences.
+            - List key details using bullet points Suchlike (⭐).Indicate the source at the end of the most relevant contanet sign: [Video: title, mm:ss]
+            - If the answer is not in the videos, state ONLY the Turkish sentence: "Bu konu videolarda ele alınmamış."
+            -End the answer with a beautiful Turkish expression: 
+
+            *RULE #2: EXCEPTION - Answering Off-Topic Scientific Questions*
+            If the user's question is a contextually relevant question (e.g., if it's about video content), you must follow these rules:          - Switch to a general "helpful assistant" mode for this answer.
+            - Provide a concise, accurate, and scientific answer.
+            - Keep the answer direct and easy to understand.
+            - After providing the scientific answer, gently guide the user back to the primary topic with the Turkish phrase: "Umarım bu açıklama yardımcı olmuştur. Derslerle ilgili başka sorun olursa, yine buradayım!"
+
+            *RULE #3: Handling Other Off-Topic Questions*
+            If the question is not related to the videos AND not a scientific question, state ONLY the Turkish sentence: "Ben bir eğitim asistanıyım ve sadece ders içerikleri veya genel bilimsel konularda yardımcı olabilirim."
+
+            *IMPORTANT:*
+            - Your final response must ALWAYS be in Turkish.
+            - Assess the user's question first to decide which rule to apply (Rule #1, #2, or #3).
+
+            ---
+            SOURCE DOCUMENTS (Only for Rule #1):
+            {context}
+
+            QUESTION: {question}
+
+            ANSWER:"""
+
+    def __init__(self, collection_name: str, base_persist_directory: str = "./rag_collections",
+                 videos_directory: Optional[Union[str, Path]] = None):
         self._validate_environment()
-        self._setup_paths(collection_name, base_persist_directory)
+        self._setup_paths(collection_name, base_persist_directory, videos_directory)
         self._initialize_components()
 
     def _validate_environment(self) -> None:
         if not os.getenv("GOOGLE_API_KEY"):
             raise ValueError("GOOGLE_API_KEY environment variable not found.")
 
-    def _setup_paths(self, collection_name: str, base_persist_directory: str) -> None:
+    def _setup_paths(self, collection_name: str, base_persist_directory: str,
+                     videos_directory: Optional[Union[str, Path]] = None) -> None:
         # Get the correct collection directory path
         base_collection_path = get_collection_dir(collection_name)
         
@@ -149,9 +371,12 @@ class QueryManager:
             self.collection_path = base_collection_path / latest_uuid
             logger.info(f"Using UUID subdirectory: {self.collection_path}")
         
-        # Get the original directory name for videos directory
-        original_dir_name = find_original_dir_name(collection_name)
-        self.videos_directory = Path("Education_video") / original_dir_name
+        if videos_directory is not None:
+            self.videos_directory = Path(videos_directory)
+        else:
+            # Get the original directory name for videos directory
+            original_dir_name = find_original_dir_name(collection_name)
+            self.videos_directory = Path("Education_video") / original_dir_name
 
         if not self.collection_path.exists():
             raise FileNotFoundError(f"Collection path not found: {self.collection_path}")
@@ -161,45 +386,101 @@ class QueryManager:
         logger.info(f"Final collection path: {self.collection_path}")
         logger.info(f"Videos directory: {self.videos_directory}")
 
+    @classmethod
+    def get(cls, collection_name: str) -> "QueryManager":
+        """Shared, fully initialized instance for the collection (see get_query_manager)."""
+        return get_query_manager(collection_name)
+
     def _initialize_components(self) -> None:
         logger.info(f"Initializing multimodal RAG components from: {self.collection_path}")
 
-        self.embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-        self.vector_store = Chroma(
-            persist_directory=str(self.collection_path),
-            embedding_function=self.embeddings
-        )
-        self.llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", temperature=0.3)
-        self.retriever = self.vector_store.as_retriever(
-            search_type="mmr",
-            search_kwargs={"k": 4, "fetch_k": 20}
+        self.embeddings = get_shared_embeddings()
+        # Native client: queries go straight to the collection, without LangChain's vector store wrapper.
+        self.chroma_client = chromadb.PersistentClient(path=str(self.collection_path))
+        self.collection = self.chroma_client.get_collection(name=COLLECTION_NAME)
+        # Counted once here; a COUNT(*) per question is a full SQLite scan on large collections.
+        self._doc_count = self.collection.count()
+        logger.info(f"Vector store collection count: {self._doc_count}")
+        self.llm = get_shared_llm()
+        # Optional shared cache of (documents, frame) per question; enabled when REDIS_URL is set.
+        self._redis = get_redis_client()
+        self._answer_cache = SemanticAnswerCache(
+            threshold=self.SEMANTIC_CACHE_THRESHOLD, ttl_seconds=self.RETRIEVAL_CACHE_TTL_SECONDS
         )
 
         logger.info("Multimodal RAG query manager initialized successfully.")
 
-    def _retrieve_context_and_image(self, question: str) -> Tuple[List[Document], Optional[Image.Image]]:
-        """Retrieve relevant documents and extract the frame from the most relevant video."""
-        retrieval_start_time = time.perf_counter()
-        
-        # Debug: Check vector store collection count
+    def _embed_question(self, question: str) -> List[float]:
+        # Repeated questions are answered from the CachedEmbeddings LRU, not the embedding API.
+        return self.embeddings.embed_query(question)
+
+    def _search_by_vector(self, question_embedding: List[float]) -> List[Document]:
+        """
+        Fetch RETRIEVAL_FETCH_K nearest chunks from Chroma, re-rank them with mmr_select for diversity
+        and wrap only the RETRIEVAL_K selected ones as Documents.
+        """
+        results = self.collection.query(
+            query_embeddings=[question_embedding],
+            n_results=self.RETRIEVAL_FETCH_K,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        documents = results["documents"][0]
+        if not documents:
+            return []
+        metadatas = results["metadatas"][0]
+
+        selected = mmr_select(question_embedding, results["embeddings"][0], k=self.RETRIEVAL_K)
+        return [Document(page_content=documents[i], metadata=metadatas[i] or {}) for i in selected]
+
+    def _search(self, question: str) -> List[Document]:
+        """MMR search using the memoized question embedding."""
+        return self._search_by_vector(self._embed_question(question))
+
+    def _retrieval_cache_key(self, question: str) -> str:
+        digest = hashlib.sha256(f"{self.collection_path}\0{question}".encode("utf-8")).hexdigest()
+        # v2: JSON payload; keys written by the old pickle format are never read.
+        return f"sterk:retrieval:v2:{digest}"
+
+    def _get_cached_retrieval(self, question: str) -> Optional[Tuple[List[Document], Optional[bytes]]]:
+        if self._redis is None:
+            return None
         try:
-            collection_count = self.vector_store._collection.count()
-            logger.info(f"Vector store collection count: {collection_count}")
+            raw = self._redis.get(self._retrieval_cache_key(question))
         except Exception as e:
-            logger.error(f"Error getting collection count: {e}")
-        
-        retrieved_docs = self.retriever.invoke(question)
-        retrieval_end_time = time.perf_counter()
-        logger.info(
-            f"PERF: Vector database search (retrieval) took {(retrieval_end_time - retrieval_start_time) * 1000:.2f} ms.")
-        logger.info(f"Retrieved {len(retrieved_docs)} documents")
-
-        if not retrieved_docs:
-            logger.warning("No documents retrieved from vector store")
-            return [], None
+            logger.warning(f"Retrieval cache read failed: {e}")
+            return None
+        if not raw:
+            return None
+        try:
+            payload = json.loads(raw)
+            retrieved_docs = [Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                              for doc in payload["docs"]]
+            frame = payload["frame"]
+            return retrieved_docs, base64.b64decode(frame) if frame is not None else None
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Retrieval cache entry is malformed, ignoring it: {e}")
+            return None
+
+    def _set_cached_retrieval(self, question: str, retrieved_docs: List[Document], frame_bytes: Optional[bytes]) -> None:
+        if self._redis is None:
+            return
+        # JSON rather than pickle: unpickling a value from a shared Redis would allow code execution.
+        payload = json.dumps({
+            "docs": [{"page_content": doc.page_content, "metadata": doc.metadata} for doc in retrieved_docs],
+            "frame": base64.b64encode(frame_bytes).decode("ascii") if frame_bytes is not None else None,
+        })
+        try:
+            self._redis.set(
+                self._retrieval_cache_key(question),
+                payload,
+                ex=self.RETRIEVAL_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            logger.warning(f"Retrieval cache write failed: {e}")
 
+    def _extract_frame(self, most_relevant_doc: Document) -> Optional[bytes]:
+        """Extract the frame belonging to the most relevant document as JPEG bytes."""
         frame_extraction_start_time = time.perf_counter()
-        most_relevant_doc = retrieved_docs[0]
         metadata = most_relevant_doc.metadata
         logger.info(f"Most relevant doc metadata: {metadata}")
         video_title = metadata['video_title']
@@ -208,91 +489,129 @@ class QueryManager:
             video_path = self.videos_directory / video_title
         else:
             video_path = self.videos_directory / f"{video_title}.mp4"
-        frame_image = get_frame_from_video(str(video_path), metadata['start_ms'])
+        # Snap to a FRAME_BUCKET_MS grid so nearby timestamps share one entry in the frame LRU.
+        bucket_ms = (metadata['start_ms'] // self.FRAME_BUCKET_MS) * self.FRAME_BUCKET_MS
+        # Downscaled for Gemini inside the frame cache, so a cache hit needs no resize or re-encode.
+        frame_bytes = get_frame_bytes_from_video(str(video_path), bucket_ms, max_size=FRAME_MAX_SIZE)
         frame_extraction_end_time = time.perf_counter()
         logger.info(
             f"PERF: Video frame extraction took {(frame_extraction_end_time - frame_extraction_start_time) * 1000:.2f} ms.")
+        return frame_bytes
 
-        return retrieved_docs, frame_image
+    def _retrieve_context_and_image(self, question: str) -> Tuple[List[Document], Optional[bytes]]:
+        """Retrieve relevant documents and extract the frame (JPEG bytes) from the most relevant video."""
+        cached = self._get_cached_retrieval(question)
+        if cached is not None:
+            logger.info("Retrieval cache hit")
+            return cached
 
-    def _format_context_for_prompt(self, source_documents: List[Document]) -> str:
-        context_text = ""
-        for i, doc in enumerate(source_documents):
-            metadata = doc.metadata
-            video_title = metadata.get('video_title', 'Unknown Video')
-            start_ms = metadata.get('start_ms', 0)
-
-            seconds = start_ms // 1000
-            minutes = seconds // 60
-            remaining_seconds = seconds % 60
-            timestamp = f"{minutes:02d}:{remaining_seconds:02d}"
-
-            context_text += f"--- Source Document {i + 1} ---\n"
-            context_text += f"Video Title: {video_title}\n"
-            context_text += f"Timestamp: {timestamp}\n"
-            context_text += f"Content: {doc.page_content}\n\n"
-
-        return context_text
+        retrieval_start_time = time.perf_counter()
+        retrieved_docs = self._search(question)
+        retrieval_end_time = time.perf_counter()
+        logger.info(
+            f"PERF: Vector database search (retrieval) took {(retrieval_end_time - retrieval_start_time) * 1000:.2f} ms.")
+        logger.info(f"Retrieved {len(retrieved_docs)} documents")
 
-    def _create_prompt(self, formatted_context: str, question: str) -> str:
-        return f"""You are "EğitimBot," an expert educational assistant. Your primary purpose is to provide clear and helpful answers to students using information strictly from the provided video transcripts.
+        if not retrieved_docs:
+            logger.warning("No documents retrieved from vector store")
+            return [], None
 
-            PERSONA:
-            - A patient and supportive teacher
-            - Professional yet warm
-            - Focused on student learning
+        frame_bytes = self._extract_frame(retrieved_docs[0])
+        self._set_cached_retrieval(question, retrieved_docs, frame_bytes)
+        return retrieved_docs, frame_bytes
 
-            ---
-            *CORE TASK & RULES*
+    async def _aretrieve_documents(self, question: str) -> List[Document]:
+        retrieval_start_time = time.perf_counter()
+        question_embedding = await asyncio.to_thread(self._embed_question, question)
+        retrieved_docs = await asyncio.to_thread(self._search_by_vector, question_embedding)
+        retrieval_end_time = time.perf_counter()
+        logger.info(
+            f"PERF: Vector database search (retrieval) took {(retrieval_end_time - retrieval_start_time) * 1000:.2f} ms.")
+        logger.info(f"Retrieved {len(retrieved_docs)} documents")
 
-            *RULE #1: PRIMARY TASK - Answering from Video Content*
-            If the user's question is related to the provided video content, you MUST follow these rules:
-            - Answer ONLY with information from the SOURCE DOCUMENTS. Do not use external knowledge.
-            - Start your response directly with the Turkish phrase: "Eğitim içeriğimize göre...."
-            - Summarize the main point in 1-2 sentences.
-            - List key details using bullet points Suchlike (⭐).Indicate the source at the end of the most relevant contanet sign: [Video: title, mm:ss]
-            - If the answer is not in the videos, state ONLY the Turkish sentence: "Bu konu videolarda ele alınmamış."
-            -End the answer with a beautiful Turkish expression: 
+        if not retrieved_docs:
+            logger.warning("No documents retrieved from vector store")
+        return retrieved_docs
+
+    async def _aprepare_model_input(self, question: str) -> Tuple[List[Document], Optional[List[HumanMessage]]]:
+        """
+        Async retrieval + prompt construction. Once the documents are known, the frame extraction
+        and the context formatting do not depend on each other and run concurrently.
+        Returns ([], None) when nothing relevant was retrieved.
+        """
+        cached = await asyncio.to_thread(self._get_cached_retrieval, question)
+        if cached is not None:
+            logger.info("Retrieval cache hit")
+            retrieved_docs, frame_bytes = cached
+            formatted_context = self._format_context_for_prompt(retrieved_docs)
+        else:
+            retrieved_docs = await self._aretrieve_documents(question)
+            if not retrieved_docs:
+                return [], None
 
-            *RULE #2: EXCEPTION - Answering Off-Topic Scientific Questions*
-            If the user's question is a contextually relevant question (e.g., if it's about video content), you must follow these rules:          - Switch to a general "helpful assistant" mode for this answer.
-            - Provide a concise, accurate, and scientific answer.
-            - Keep the answer direct and easy to understand.
-            - After providing the scientific answer, gently guide the user back to the primary topic with the Turkish phrase: "Umarım bu açıklama yardımcı olmuştur. Derslerle ilgili başka sorun olursa, yine buradayım!"
+            frame_bytes, formatted_context = await asyncio.gather(
+                asyncio.to_thread(self._extract_frame, retrieved_docs[0]),
+                asyncio.to_thread(self._format_context_for_prompt, retrieved_docs)
+            )
+            await asyncio.to_thread(self._set_cached_retrieval, question, retrieved_docs, frame_bytes)
 
-            *RULE #3: Handling Other Off-Topic Questions*
-            If the question is not related to the videos AND not a scientific question, state ONLY the Turkish sentence: "Ben bir eğitim asistanıyım ve sadece ders içerikleri veya genel bilimsel konularda yardımcı olabilirim."
+        prompt = self._create_prompt(formatted_context, question)
+        message_content = await asyncio.to_thread(self._build_message_content, prompt, frame_bytes)
+        return retrieved_docs, [HumanMessage(content=message_content)]
 
-            *IMPORTANT:*
-            - Your final response must ALWAYS be in Turkish.
-            - Assess the user's question first to decide which rule to apply (Rule #1, #2, or #3).
+    def _format_context_for_prompt(self, source_documents: List[Document]) -> str:
+        parts = []
+        for i, doc in enumerate(source_documents, start=1):
+            metadata = doc.metadata
+            video_title = metadata.get('video_title', 'Unknown Video')
+            minutes, seconds = divmod(metadata.get('start_ms', 0) // 1000, 60)
 
-            ---
-            SOURCE DOCUMENTS (Only for Rule #1):
-            {formatted_context}
+            parts.append(
+                f"--- Source Document {i} ---\n"
+                f"Video Title: {video_title}\n"
+                f"Timestamp: {minutes:02d}:{seconds:02d}\n"
+                f"Content: {doc.page_content}\n\n"
+            )
 
-            QUESTION: {question}
+        return "".join(parts)
 
-            ANSWER:"""
+    def _create_prompt(self, formatted_context: str, question: str) -> str:
+        return self.PROMPT_TEMPLATE.format_map({"context": formatted_context, "question": question})
 
-    def _build_message_content(self, prompt: str, frame_image: Optional[Image.Image]) -> List[Dict[str, Any]]:
+    def _build_message_content(self, prompt: str, frame_bytes: Optional[bytes]) -> List[Dict[str, Any]]:
         message_content = [{"type": "text", "text": prompt}]
 
-        if frame_image:
-            base64_image = pil_to_base64(frame_image)
+        if frame_bytes:
+            # Already downscaled JPEG bytes, sent as an inline Blob part; no decode or base64 round-trip.
             message_content.append({
-                "type": "image_url",
-                "image_url": {"url": base64_image}
+                "type": "media",
+                "mime_type": "image/jpeg",
+                "data": frame_bytes
             })
 
         return message_content
 
+    def _build_model_input(self, question: str, retrieved_docs: List[Document],
+                           frame_bytes: Optional[bytes]) -> List[HumanMessage]:
+        formatted_context = self._format_context_for_prompt(retrieved_docs)
+        prompt = self._create_prompt(formatted_context, question)
+
+        message_content = self._build_message_content(prompt, frame_bytes)
+        return [HumanMessage(content=message_content)]
+
     def ask(self, question: str) -> Dict[str, Any]:
         """Process a multimodal question and return the answer with source documents."""
         logger.info(f"Processing multimodal question: '{question}'")
         total_start_time = time.perf_counter()
 
-        retrieved_docs, frame_image = self._retrieve_context_and_image(question)
+        # The embedding is memoized, so retrieval below reuses it instead of embedding again.
+        question_embedding = self._embed_question(question)
+        cached_answer = self._answer_cache.get(question_embedding)
+        if cached_answer is not None:
+            logger.info("Semantic answer cache hit")
+            return cached_answer
+
+        retrieved_docs, frame_bytes = self._retrieve_context_and_image(question)
 
         if not retrieved_docs:
             return {
@@ -300,11 +619,7 @@ class QueryManager:
                 "source_documents": []
             }
 
-        formatted_context = self._format_context_for_prompt(retrieved_docs)
-        prompt = self._create_prompt(formatted_context, question)
-
-        message_content = self._build_message_content(prompt, frame_image)
-        model_input = [HumanMessage(content=message_content)]
+        model_input = self._build_model_input(question, retrieved_docs, frame_bytes)
 
         llm_start_time = time.perf_counter()
         response = self.llm.invoke(model_input)
@@ -314,7 +629,164 @@ class QueryManager:
         total_end_time = time.perf_counter()
         logger.info(f"PERF: Total question answering time took {(total_end_time - total_start_time) * 1000:.2f} ms.")
 
-        return {
+        result = {
+            "answer": response.content,
+            "source_documents": retrieved_docs
+        }
+        self._answer_cache.put(question_embedding, result)
+        return result
+
+    async def aask(self, question: str) -> Dict[str, Any]:
+        """Async variant of `ask` for use inside the event loop; retrieval and the LLM call are awaited."""
+        logger.info(f"Processing multimodal question (async): '{question}'")
+        total_start_time = time.perf_counter()
+
+        question_embedding = await asyncio.to_thread(self._embed_question, question)
+        cached_answer = self._answer_cache.get(question_embedding)
+        if cached_answer is not None:
+            logger.info("Semantic answer cache hit")
+            return cached_answer
+
+        retrieved_docs, model_input = await self._aprepare_model_input(question)
+
+        if not retrieved_docs:
+            return {
+                "answer": "No content was found in the videos related to your question.",
+                "source_documents": []
+            }
+
+        llm_start_time = time.perf_counter()
+        response = await self.llm.ainvoke(model_input)
+        llm_end_time = time.perf_counter()
+        logger.info(f"PERF: LLM API call (Gemini) took {(llm_end_time - llm_start_time) * 1000:.2f} ms.")
+
+        total_end_time = time.perf_counter()
+        logger.info(f"PERF: Total question answering time took {(total_end_time - total_start_time) * 1000:.2f} ms.")
+
+        result = {
             "answer": response.content,
             "source_documents": retrieved_docs
         }
+        self._answer_cache.put(question_embedding, result)
+        return result
+
+    async def aask_many(self, questions: List[str]) -> List[Dict[str, Any]]:
+        """
+        Answer several questions concurrently (e.g. batch evaluation), at most
+        ASK_MANY_CONCURRENCY at a time. Results are returned in input order.
+        """
+        semaphore = asyncio.Semaphore(self.ASK_MANY_CONCURRENCY)
+
+        async def bounded_ask(question: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.aask(question)
+
+        return await asyncio.gather(*(bounded_ask(question) for question in questions))
+
+    async def ask_stream(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the answer as it is generated.
+        Yields {"delta": text} for every LLM chunk, then a final {"source_documents": [...]}.
+        """
+        logger.info(f"Processing multimodal question (stream): '{question}'")
+        total_start_time = time.perf_counter()
+
+        question_embedding = await asyncio.to_thread(self._embed_question, question)
+        cached_answer = self._answer_cache.get(question_embedding)
+        if cached_answer is not None:
+            logger.info("Semantic answer cache hit")
+            yield {"delta": cached_answer["answer"]}
+            yield {"source_documents": cached_answer["source_documents"]}
+            return
+
+        retrieved_docs, model_input = await self._aprepare_model_input(question)
+
+        if not retrieved_docs:
+            yield {"delta": "No content was found in the videos related to your question."}
+            yield {"source_documents": []}
+            return
+
+        llm_start_time = time.perf_counter()
+        first_chunk_logged = False
+        answer_parts = []
+        async for chunk in self.llm.astream(model_input):
+            if not first_chunk_logged:
+                logger.info(f"PERF: LLM first chunk (Gemini) after {(time.perf_counter() - llm_start_time) * 1000:.2f} ms.")
+                first_chunk_logged = True
+            if chunk.content:
+                answer_parts.append(chunk.content)
+                yield {"delta": chunk.content}
+        llm_end_time = time.perf_counter()
+        logger.info(f"PERF: LLM API call (Gemini, streamed) took {(llm_end_time - llm_start_time) * 1000:.2f} ms.")
+
+        total_end_time = time.perf_counter()
+        logger.info(f"PERF: Total question answering time took {(total_end_time - total_start_time) * 1000:.2f} ms.")
+
+        self._answer_cache.put(question_embedding, {"answer": "".join(answer_parts), "source_documents": retrieved_docs})
+        yield {"source_documents": retrieved_docs}
+
+
+# One QueryManager per collection is shared across requests, least recently used first. Evicted managers
+# are only dropped from the cache, never closed: requests that already hold one finish with it and the
+# garbage collector releases its Chroma client afterwards.
+QUERY_MANAGER_CACHE_SIZE = 32
+_query_manager_cache: "OrderedDict[str, QueryManager]" = OrderedDict()
+# Guards the cache dicts only; opening a collection happens outside it, under that collection's own lock.
+_query_manager_lock = threading.Lock()
+_query_manager_init_locks: Dict[str, threading.Lock] = {}
+# Bumped by evict_query_manager; a manager opened across an eviction is not cached (it may point at the old UUID).
+_query_manager_generation: Dict[str, int] = {}
+
+
+def _cached_query_manager(collection_name: str) -> Optional[QueryManager]:
+    # Caller holds _query_manager_lock.
+    query_manager = _query_manager_cache.get(collection_name)
+    if query_manager is not None:
+        _query_manager_cache.move_to_end(collection_name)
+    return query_manager
+
+
+def get_query_manager(collection_name: str) -> QueryManager:
+    """Return the shared QueryManager for a collection, creating it on first use."""
+    with _query_manager_lock:
+        query_manager = _cached_query_manager(collection_name)
+        if query_manager is not None:
+            return query_manager
+        init_lock = _query_manager_init_locks.setdefault(collection_name, threading.Lock())
+
+    # Concurrent first requests for the same collection wait here; other collections are not blocked.
+    with init_lock:
+        with _query_manager_lock:
+            query_manager = _cached_query_manager(collection_name)
+            if query_manager is not None:
+                return query_manager
+            generation = _query_manager_generation.get(collection_name, 0)
+
+        try:
+            query_manager = QueryManager(collection_name=collection_name)
+        except BaseException:
+            with _query_manager_lock:
+                if _query_manager_init_locks.get(collection_name) is init_lock:
+                    del _query_manager_init_locks[collection_name]
+            raise
+
+        # Cache insert and lock removal in one step, so a newcomer either sees the manager or waits on init_lock.
+        with _query_manager_lock:
+            if _query_manager_init_locks.get(collection_name) is init_lock:
+                del _query_manager_init_locks[collection_name]
+            if _query_manager_generation.get(collection_name, 0) == generation:
+                _query_manager_cache[collection_name] = query_manager
+                if len(_query_manager_cache) > QUERY_MANAGER_CACHE_SIZE:
+                    evicted_name, _ = _query_manager_cache.popitem(last=False)
+                    logger.info(f"Evicting query manager for collection '{evicted_name}'")
+        return query_manager
+
+
+def evict_query_manager(collection_name: str) -> None:
+    """Drop the cached manager, e.g. after the collection was rebuilt under a new UUID."""
+    with _query_manager_lock:
+        manager = _query_manager_cache.pop(collection_name, None)
+        _query_manager_generation[collection_name] = _query_manager_generation.get(collection_name, 0) + 1
+    if manager is not None:
+        # Requests still holding the old manager must not keep serving answers from the old collection.
+        manager._answer_cache.clear()
@@ -165,9 +165,10 @@ document.addEventListener("DOMContentLoaded", async () => {
         
         const checkAndEnsureCollection = async (collectionName) => {
             try {
-                // Önce koleksiyon var mı kontrol et
-                const response = await fetch(`/api/check-collection/${collectionName}`);
-                const data = await response.json();
+                // Önce koleksiyon var mı kontrol et; /api/videolar zaten hazır olduğunu söylüyorsa istek atma
+                const data = (collectionName === videoData.collection_name && videoData.collection_exists)
+                    ? { exists: true, uuid: videoData.collection_uuid }
+                    : await (await fetch(`/api/check-collection/${collectionName}`)).json();
                 
                 if (!data.exists) {
                     // Koleksiyon yoksa, arka planda oluşturulmasını başlat
@@ -278,29 +279,80 @@ document.addEventListener("DOMContentLoaded", async () => {
             chatHistory.scrollTop = chatHistory.scrollHeight;
             
             try {
-                // Timeout ekle (30 saniye)
+                // Timeout ekle: sunucu her adımı 30 saniyeyle sınırlar ve "error" olayı gönderir; istemci biraz daha uzun bekler
                 const controller = new AbortController();
-                const timeoutId = setTimeout(() => controller.abort(), 30000);
+                const STREAM_IDLE_TIMEOUT_MS = 35000;
+                let timeoutId = setTimeout(() => controller.abort(), STREAM_IDLE_TIMEOUT_MS);
                 
-                const res = await fetch("/api/asistana-sor", {
+                const res = await fetch("/api/asistana-sor/stream", {
                     method: "POST",
                     headers: { "Content-Type": "application/json" },
                     body: JSON.stringify({ collection_name: currentCollectionName, question: question }),
                     signal: controller.signal
                 });
                 
-                clearTimeout(timeoutId);
-                const data = await res.json();
+                // Veritabanı hazır değilse veya hata varsa sunucu tek bir JSON yanıtı döner
+                const isStream = (res.headers.get("content-type") || "").startsWith("text/event-stream");
+                const data = isStream ? {} : await res.json();
+                if (!isStream) {
+                    clearTimeout(timeoutId);
+                }
                 
                 // Yükleniyor mesajını kaldır
-                const loadingMsg = document.getElementById(loadingMsgId);
-                if (loadingMsg) {
-                    loadingMsg.remove();
-                }
+                const removeLoading = () => {
+                    const loadingMsg = document.getElementById(loadingMsgId);
+                    if (loadingMsg) {
+                        loadingMsg.remove();
+                    }
+                };
                 
-                // Yanıtı ekle
-                chatHistory.innerHTML += `<div class="assistant-msg">${data.answer}</div>`;
-                chatHistory.scrollTop = chatHistory.scrollHeight;
+                if (isStream) {
+                    // Yanıtı token token ekle; zaman aşımı her olayda yeniden başlar, akış durursa istek iptal edilir
+                    const answerEl = document.createElement("div");
+                    answerEl.className = "assistant-msg";
+                    let answer = "";
+                    let started = false;
+                    const reader = res.body.getReader();
+                    const decoder = new TextDecoder();
+                    let buffer = "";
+                    while (true) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer += decoder.decode(value, { stream: true });
+                        const events = buffer.split("\n\n");
+                        buffer = events.pop();
+                        for (const rawEvent of events) {
+                            let eventName = "message";
+                            let eventData = "";
+                            for (const line of rawEvent.split("\n")) {
+                                if (line.startsWith("event: ")) eventName = line.slice(7);
+                                else if (line.startsWith("data: ")) eventData += line.slice(6);
+                            }
+                            clearTimeout(timeoutId);
+                            timeoutId = setTimeout(() => controller.abort(), STREAM_IDLE_TIMEOUT_MS);
+                            if (!started) {
+                                removeLoading();
+                                chatHistory.appendChild(answerEl);
+                                started = true;
+                            }
+                            if (eventName === "token") {
+                                answer += JSON.parse(eventData).delta;
+                                answerEl.innerHTML = answer;
+                            } else if (eventName === "error") {
+                                answerEl.innerHTML = answer + `<p>${JSON.parse(eventData).detail}</p>`;
+                            }
+                            chatHistory.scrollTop = chatHistory.scrollHeight;
+                        }
+                    }
+                    clearTimeout(timeoutId);
+                    removeLoading();
+                } else {
+                    removeLoading();
+                    
+                    // Yanıtı ekle
+                    chatHistory.innerHTML += `<div class="assistant-msg">${data.answer}</div>`;
+                    chatHistory.scrollTop = chatHistory.scrollHeight;
+                }
                 
                 // Eğer "processing" durumu varsa, kullanıcıya bilgi ver
                 if (data.status === "processing") {
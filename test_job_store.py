@@ -0,0 +1,124 @@
+"""
+Unit tests for JobStore, in memory and against a minimal Redis stand-in.
+"""
+
+import json
+
+import pytest
+
+import job_store
+from job_store import JOB_TTL_SECONDS, JobStore
+
+
+class _FakePipeline:
+    def __init__(self, redis_client):
+        self._redis = redis_client
+        self._commands = []
+
+    def hset(self, key, mapping):
+        self._commands.append(("hset", key, mapping))
+
+    def expire(self, key, seconds):
+        self._commands.append(("expire", key, seconds))
+
+    def execute(self):
+        for command, key, argument in self._commands:
+            if command == "hset":
+                self._redis.hashes.setdefault(key, {}).update(
+                    {name.encode(): value.encode() for name, value in argument.items()}
+                )
+            else:
+                self._redis.expiry[key] = argument
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.expiry = {}
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    return JobStore(redis_client=_FakeRedis() if request.param == "redis" else None)
+
+
+def test_create_and_get(store):
+    job_id = store.create(video_title="ders-1")
+
+    job = store.get(job_id)
+    assert job["task_id"] == job_id
+    assert job["status"] == "queued"
+    assert job["video_title"] == "ders-1"
+
+
+def test_update_merges_fields(store):
+    job_id = store.create()
+
+    store.update(job_id, status="processing", progress=50)
+    store.update(job_id, progress=100, result={"chunks": [1, 2]})
+
+    job = store.get(job_id)
+    assert (job["status"], job["progress"], job["result"]) == ("processing", 100, {"chunks": [1, 2]})
+    assert "updated_at" in job
+
+
+def test_unknown_job(store):
+    assert store.get("missing") is None
+
+
+def test_get_returns_a_copy():
+    store = JobStore()
+    job_id = store.create()
+
+    store.get(job_id)["status"] = "changed"
+
+    assert store.get(job_id)["status"] == "queued"
+
+
+def test_memory_jobs_expire_after_last_update(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(job_store.time, "monotonic", lambda: now[0])
+    store = JobStore()
+    old_id = store.create()
+    kept_id = store.create()
+
+    now[0] += JOB_TTL_SECONDS - 1
+    store.update(kept_id, progress=10)
+    now[0] += 2
+
+    assert store.get(old_id) is None
+    assert store.get(kept_id)["progress"] == 10
+    # Expired jobs are dropped from memory on the next write, not just hidden.
+    store.create()
+    assert old_id not in store._jobs
+
+
+def test_redis_jobs_are_json_hash_fields_with_ttl():
+    redis_client = _FakeRedis()
+    store = JobStore(redis_client=redis_client, key_prefix="test:")
+    job_id = store.create()
+    store.update(job_id, progress=40)
+
+    stored = redis_client.hashes[f"test:{job_id}"]
+    assert json.loads(stored[b"task_id"]) == job_id
+    assert json.loads(stored[b"progress"]) == 40
+    assert redis_client.expiry[f"test:{job_id}"] == JOB_TTL_SECONDS
+
+
+def test_redis_updates_from_different_workers_do_not_overwrite_each_other():
+    redis_client = _FakeRedis()
+    first_worker = JobStore(redis_client=redis_client)
+    second_worker = JobStore(redis_client=redis_client)
+    job_id = first_worker.create()
+
+    first_worker.update(job_id, progress=70)
+    second_worker.update(job_id, status="running")
+
+    job = first_worker.get(job_id)
+    assert (job["status"], job["progress"]) == ("running", 70)
@@ -0,0 +1,170 @@
+"""
+Unit tests for the retrieval helpers of query_manager that need no collection or API key.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+qm = pytest.importorskip("query_manager")
+from langchain_core.documents import Document
+
+
+# --- mmr_select ---
+
+def test_mmr_select_starts_with_most_similar():
+    embeddings = [[0.0, 1.0], [1.0, 0.0], [0.7, 0.7]]
+    assert qm.mmr_select([1.0, 0.1], embeddings, k=1)[0] == 1
+
+
+def test_mmr_select_skips_near_duplicates():
+    # Candidates 0 and 1 point almost the same way; with diversity weight the second pick is 2, not 0.
+    embeddings = [[1.0, 0.0], [0.995, 0.0998], [0.0, 1.0]]
+    assert qm.mmr_select([0.866, 0.5], embeddings, k=2, lambda_mult=0.5) == [1, 2]
+
+
+def test_mmr_select_pure_relevance_ranks_by_similarity():
+    embeddings = [[1.0, 0.0], [0.995, 0.0998], [0.0, 1.0]]
+    assert qm.mmr_select([0.866, 0.5], embeddings, k=3, lambda_mult=1.0) == [1, 0, 2]
+
+
+def test_mmr_select_edge_cases():
+    assert qm.mmr_select([1.0, 0.0], [], k=3) == []
+    assert qm.mmr_select([1.0, 0.0], [[1.0, 0.0]], k=0) == []
+    # k larger than the candidate count returns every candidate once.
+    assert sorted(qm.mmr_select([1.0, 0.0], [[1.0, 0.0], [0.0, 1.0]], k=5)) == [0, 1]
+
+
+# --- CachedEmbeddings ---
+
+class _RecordingEmbeddings:
+    def __init__(self):
+        self.queries = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(self.queries)), 0.0]
+
+    def embed_documents(self, texts):
+        return [[0.0, 1.0] for _ in texts]
+
+
+def test_cached_embeddings_key_is_normalized_but_model_sees_original_text():
+    inner = _RecordingEmbeddings()
+    embeddings = qm.CachedEmbeddings(inner)
+
+    first = embeddings.embed_query("  İstanbul nerede? ")
+    second = embeddings.embed_query("i̇stanbul nerede?")
+
+    assert first == second
+    assert inner.queries == ["  İstanbul nerede? "]
+
+
+def test_cached_embeddings_evicts_least_recently_used():
+    inner = _RecordingEmbeddings()
+    embeddings = qm.CachedEmbeddings(inner, maxsize=2)
+
+    embeddings.embed_query("a")
+    embeddings.embed_query("b")
+    embeddings.embed_query("a")
+    embeddings.embed_query("c")
+    embeddings.embed_query("a")
+    embeddings.embed_query("b")
+
+    assert inner.queries == ["a", "b", "c", "b"]
+
+
+# --- SemanticAnswerCache ---
+
+def _result(answer):
+    return {"answer": answer, "source_documents": [Document(page_content=answer, metadata={})]}
+
+
+def test_semantic_cache_hit_and_miss():
+    cache = qm.SemanticAnswerCache(threshold=0.95, maxsize=4)
+    cache.put([1.0, 0.0], _result("a"))
+
+    assert cache.get([0.99, 0.01])["answer"] == "a"
+    assert cache.get([0.0, 1.0]) is None
+
+
+def test_semantic_cache_returns_copies():
+    cache = qm.SemanticAnswerCache(maxsize=4)
+    cache.put([1.0, 0.0], _result("a"))
+
+    hit = cache.get([1.0, 0.0])
+    hit["answer"] = "changed"
+    hit["source_documents"].clear()
+
+    again = cache.get([1.0, 0.0])
+    assert again["answer"] == "a"
+    assert len(again["source_documents"]) == 1
+
+
+def test_semantic_cache_ring_buffer_overwrites_oldest():
+    cache = qm.SemanticAnswerCache(maxsize=2)
+    cache.put([1.0, 0.0, 0.0], _result("a"))
+    cache.put([0.0, 1.0, 0.0], _result("b"))
+    cache.put([0.0, 0.0, 1.0], _result("c"))
+
+    assert cache.get([1.0, 0.0, 0.0]) is None
+    assert cache.get([0.0, 1.0, 0.0])["answer"] == "b"
+    assert cache.get([0.0, 0.0, 1.0])["answer"] == "c"
+
+
+def test_semantic_cache_expires_and_clears(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(qm.time, "monotonic", lambda: now[0])
+    cache = qm.SemanticAnswerCache(maxsize=4, ttl_seconds=60)
+    cache.put([1.0, 0.0], _result("a"))
+
+    now[0] += 61
+    assert cache.get([1.0, 0.0]) is None
+
+    cache.put([1.0, 0.0], _result("b"))
+    cache.clear()
+    assert cache.get([1.0, 0.0]) is None
+
+
+# --- Redis retrieval cache ---
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode("utf-8") if isinstance(value, str) else value
+
+
+def _manager_with_redis(redis_client):
+    manager = qm.QueryManager.__new__(qm.QueryManager)
+    manager.collection_path = "rag_collections/ders/uuid"
+    manager._redis = redis_client
+    return manager
+
+
+def test_retrieval_cache_round_trips_as_json():
+    redis_client = _FakeRedis()
+    manager = _manager_with_redis(redis_client)
+    docs = [Document(page_content="metin", metadata={"video_title": "ders.mp4", "start_ms": 1500})]
+
+    manager._set_cached_retrieval("soru", docs, b"\xff\xd8jpeg")
+
+    (raw,) = redis_client.values.values()
+    assert raw.startswith(b"{")
+    cached_docs, frame = manager._get_cached_retrieval("soru")
+    assert [(d.page_content, d.metadata) for d in cached_docs] == [("metin", docs[0].metadata)]
+    assert frame == b"\xff\xd8jpeg"
+
+
+def test_retrieval_cache_without_frame_and_malformed_entry():
+    redis_client = _FakeRedis()
+    manager = _manager_with_redis(redis_client)
+
+    manager._set_cached_retrieval("soru", [], None)
+    assert manager._get_cached_retrieval("soru") == ([], None)
+
+    redis_client.values[manager._retrieval_cache_key("soru")] = b"not json"
+    assert manager._get_cached_retrieval("soru") is None
@@ -0,0 +1,212 @@
+"""
+Unit tests for video_chunks_generator: transcript chunking and VTT subtitle parsing.
+"""
+
+import pytest
+
+vcg = pytest.importorskip("video_chunks_generator")
+VideoChunker = vcg.VideoChunker
+OnlineVideoProcessor = vcg.OnlineVideoProcessor
+
+
+def _units(token_counts):
+    """Sentence units as _windows expects them: (start_char, end_char, tokens, start_ms, end_ms)."""
+    return [(i * 10, i * 10 + 5, tokens, i * 1000, i * 1000 + 900) for i, tokens in enumerate(token_counts)]
+
+
+def _window_tokens(window, units):
+    start_char, end_char = window[0], window[1]
+    return [unit[2] for unit in units if unit[0] >= start_char and unit[1] <= end_char]
+
+
+# --- VideoChunker._windows ---
+
+def test_windows_respect_token_budget_after_stride():
+    chunker = VideoChunker(chunk_tokens=120, stride_ratio=0.75)
+    units = _units([5, 100, 10, 50])
+
+    windows = chunker._windows(units)
+
+    # Dropping only the stride (S=90) would leave [100, 10] + 50 = 160 tokens.
+    assert [_window_tokens(w, units) for w in windows] == [[5, 100, 10], [10, 50]]
+
+
+def test_windows_never_exceed_budget_except_for_single_long_sentence():
+    chunker = VideoChunker(chunk_tokens=120, stride_ratio=0.75)
+    units = _units([5, 100, 10, 50, 30, 200, 3, 60, 60, 60])
+
+    windows = chunker._windows(units)
+
+    for window in windows:
+        tokens = _window_tokens(window, units)
+        assert sum(tokens) <= chunker.chunk_tokens or len(tokens) == 1
+    covered = {unit for window in windows for unit in units if window[0] <= unit[0] and unit[1] <= window[1]}
+    assert covered == set(units)
+
+
+def test_windows_overlap_and_carry_timestamps():
+    chunker = VideoChunker(chunk_tokens=100, stride_ratio=0.5)
+    units = _units([40, 40, 40, 40])
+
+    windows = chunker._windows(units)
+
+    assert [_window_tokens(w, units) for w in windows] == [[40, 40], [40, 40], [40, 40]]
+    assert [(w[2], w[3]) for w in windows] == [(0, 1900), (1000, 2900), (2000, 3900)]
+
+
+def test_windows_empty_input():
+    assert VideoChunker()._windows([]) == []
+
+
+def test_sentences_per_chunk_is_deprecated_but_accepted():
+    with pytest.warns(DeprecationWarning):
+        chunker = VideoChunker(sentences_per_chunk=5)
+    assert chunker.chunk_tokens == 5 * VideoChunker.APPROX_TOKENS_PER_SENTENCE
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        VideoChunker(chunk_tokens=0)
+    with pytest.raises(ValueError):
+        VideoChunker(stride_ratio=0)
+
+
+# --- VideoChunker._attach_timestamps ---
+
+def test_attach_timestamps_spans_segments():
+    chunker = VideoChunker()
+    segment_bounds = [(0, 10, 0, 1000), (10, 20, 1000, 2000), (20, 30, 2000, 3000)]
+    units = [(0, 5, 1), (5, 15, 2), (22, 28, 1)]
+
+    timed = chunker._attach_timestamps(units, segment_bounds)
+
+    assert [(u[3], u[4]) for u in timed] == [(0, 1000), (0, 2000), (2000, 3000)]
+
+
+def test_chunk_transcript_uses_segment_times():
+    chunker = VideoChunker(chunk_tokens=120)
+    segments = [
+        {"text": "Merhaba dünya.", "start_ms": 0, "end_ms": 1500},
+        {"text": "Bu bir", "start_ms": 1500, "end_ms": 2500},
+        {"text": "deneme cümlesi.", "start_ms": 2500, "end_ms": 4000},
+    ]
+
+    chunks = chunker.chunk_transcript(segments, video_id="ders-1", video_title="ders-1.mp4")
+
+    assert len(chunks) == 1
+    assert chunks[0]["text"] == "Merhaba dünya. Bu bir deneme cümlesi."
+    assert (chunks[0]["start_ms"], chunks[0]["end_ms"]) == (0, 4000)
+    assert chunks[0]["metadata"]["video_title"] == "ders-1.mp4"
+
+
+# --- OnlineVideoProcessor VTT parsing ---
+
+class _FakeResponse:
+    def __init__(self, text):
+        self._lines = text.split("\n")
+        self.encoding = "utf-8"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+
+def _parse(monkeypatch, vtt_text):
+    monkeypatch.setattr(vcg.requests, "get", lambda url, **kwargs: _FakeResponse(vtt_text))
+    return OnlineVideoProcessor()._parse_vtt_from_url("https://example.com/subs.vtt")
+
+
+def test_vtt_time_to_ms():
+    processor = OnlineVideoProcessor()
+    assert processor._vtt_time_to_ms("01:02:03.456") == 3723456
+    assert processor._vtt_time_to_ms("00:00:07,250") == 7250
+
+
+def test_parse_vtt_skips_header_and_cue_ids(monkeypatch):
+    vtt = """WEBVTT
+Kind: captions
+Language: tr
+
+NOTE bu bir yorum
+
+intro
+00:00:01.000 --> 00:00:03.500 align:start position:0%
+hücre zarı
+iki katmanlıdır
+
+00:00:03.500 --> 00:00:05,000
+proteinler zarda yüzer
+"""
+
+    assert _parse(monkeypatch, vtt) == [
+        {"text": "hücre zarı iki katmanlıdır", "start_ms": 1000, "end_ms": 3500},
+        {"text": "proteinler zarda yüzer", "start_ms": 3500, "end_ms": 5000},
+    ]
+
+
+def test_parse_vtt_without_trailing_blank_line(monkeypatch):
+    vtt = "WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nson cue"
+    assert _parse(monkeypatch, vtt) == [{"text": "son cue", "start_ms": 0, "end_ms": 1000}]
+
+
+def test_parse_vtt_http_error_returns_empty(monkeypatch):
+    def failing_get(url, **kwargs):
+        raise vcg.requests.ConnectionError("bağlantı yok")
+
+    monkeypatch.setattr(vcg.requests, "get", failing_get)
+    assert OnlineVideoProcessor()._parse_vtt_from_url("https://example.com/subs.vtt") == []
+
+
+# --- Rolling auto-caption dedup ---
+
+ROLLING_VTT = """WEBVTT
+
+00:00:01.000 --> 00:00:03.500
+bugün hücre zarının yapısını
+inceleyeceğiz
+
+00:00:03.500 --> 00:00:05.000
+bugün hücre zarının yapısını inceleyeceğiz
+
+00:00:05.000 --> 00:00:07.250
+hücre zarının yapısını inceleyeceğiz ve proteinleri
+"""
+
+
+def test_parse_vtt_drops_rolling_repeats(monkeypatch):
+    assert _parse(monkeypatch, ROLLING_VTT) == [
+        {"text": "bugün hücre zarının yapısını inceleyeceğiz", "start_ms": 1000, "end_ms": 5000},
+        {"text": "ve proteinleri", "start_ms": 5000, "end_ms": 7250},
+    ]
+
+
+def test_dedup_keeps_short_accidental_overlaps():
+    processor = OnlineVideoProcessor()
+    segments = [
+        {"text": "evet ve", "start_ms": 0, "end_ms": 1000},
+        {"text": "ve sonra", "start_ms": 1000, "end_ms": 2000},
+    ]
+
+    # The overlap ("ve") is shorter than MIN_CUE_OVERLAP_CHARS, so nothing is trimmed.
+    assert processor._dedup_rolling_cues(segments) == segments
+
+
+def test_dedup_does_not_mutate_input():
+    processor = OnlineVideoProcessor()
+    segments = [
+        {"text": "a" * 30, "start_ms": 0, "end_ms": 1000},
+        {"text": "a" * 30, "start_ms": 1000, "end_ms": 2000},
+    ]
+
+    deduped = processor._dedup_rolling_cues(segments)
+
+    assert deduped == [{"text": "a" * 30, "start_ms": 0, "end_ms": 2000}]
+    assert segments[0]["end_ms"] == 1000
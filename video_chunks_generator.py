@@ -1,11 +1,16 @@
 import os
 import json
 import logging
+import shutil
+import subprocess
+import warnings
+from collections import deque
 import yt_dlp
 from dotenv import load_dotenv
-from typing import Dict, Any, List, Tuple
-import whisper
-from moviepy.editor import VideoFileClip
+from typing import Dict, Any, List, Optional, Tuple
+import ctranslate2
+import numpy as np
+from faster_whisper import WhisperModel
 from slugify import slugify
 
 # YENİ: VTT formatını işlemek için gerekli kütüphaneler
@@ -36,6 +41,12 @@ logger = logging.getLogger(__name__)
 # 2. VİDEO İŞLEME SINIFLARI (GÜNCELLENDİ)
 # ========================================
 
+# VTT zaman satırı ("00:01:02.345 --> 00:01:04.000 align:start ...") ve tek bir zaman damgası
+VTT_TIMING_PATTERN = re.compile(r"^(\d{2}:\d{2}:\d{2}[.,]\d{3}) --> (\d{2}:\d{2}:\d{2}[.,]\d{3})")
+VTT_TIME_PATTERN = re.compile(r"(\d{2}):(\d{2}):(\d{2})[.,](\d{3})")
+# Otomatik altyazılarda bir cue'nun başı önceki cue'nun sonunu en az bu kadar karakter tekrar ediyorsa kırpılır.
+MIN_CUE_OVERLAP_CHARS = 20
+
 class OnlineVideoProcessor:
     """
     Online videoları (örn. YouTube) işler.
@@ -52,32 +63,77 @@ class OnlineVideoProcessor:
 
     # YENİ: VTT zaman damgasını milisaniyeye çeviren yardımcı fonksiyon
     def _vtt_time_to_ms(self, time_str: str) -> int:
-        parts = time_str.split(':')
-        h, m, s_ms = int(parts[0]), int(parts[1]), float(parts[2].replace(',', '.'))
-        return int((h * 3600 + m * 60 + s_ms) * 1000)
+        h, m, s, ms = VTT_TIME_PATTERN.match(time_str).groups()
+        return ((int(h) * 60 + int(m)) * 60 + int(s)) * 1000 + int(ms)
+
+    # YENİ: YouTube otomatik altyazılarındaki "kayan" (rolling) cue tekrarlarını temizler.
+    def _dedup_rolling_cues(self, segments: List[Dict]) -> List[Dict]:
+        """
+        Art arda gelen cue'larda, yeni cue'nun önceki cue'nun sonunu tekrar eden başını kırpar.
+        Birebir aynı ya da kırpıldıktan sonra boş kalan cue önceki cue'ya eklenir (yalnızca bitiş zamanı uzar).
+        """
+        deduped: List[Dict] = []
+        for segment in segments:
+            text = segment["text"]
+            if deduped:
+                previous = deduped[-1]
+                previous_text = previous["text"]
+                if text != previous_text:
+                    # Önceki metnin sonuyla örtüşen en uzun baş kısmı bul
+                    for overlap in range(min(len(previous_text), len(text)), MIN_CUE_OVERLAP_CHARS - 1, -1):
+                        if previous_text.endswith(text[:overlap]):
+                            text = text[overlap:].strip()
+                            break
+                if not text or text == previous_text:
+                    previous["end_ms"] = max(previous["end_ms"], segment["end_ms"])
+                    continue
+            deduped.append({**segment, "text": text})
+
+        if len(deduped) < len(segments):
+            logger.info(f"Tekrarlanan altyazı cue'ları temizlendi: {len(segments)} -> {len(deduped)} segment.")
+        return deduped
 
-    # YENİ: Verilen URL'den VTT altyazısını indiren ve parse eden fonksiyon
+    # DEĞİŞTİ: VTT artık akış (stream) olarak indirilip satır satır, küçük bir durum makinesiyle parse ediliyor.
+    # Dosyanın tamamı belleğe alınmıyor ve bozuk cue'larda regex geri izleme (backtracking) yaşanmıyor.
     def _parse_vtt_from_url(self, vtt_url: str) -> List[Dict]:
         try:
-            response = requests.get(vtt_url)
-            response.raise_for_status() # HTTP hatası varsa exception fırlat
-            vtt_content = response.text
-            
-            # VTT formatını (zaman -> metin) yakalamak için Regex
-            pattern = re.compile(
-                r"(\d{2}:\d{2}:\d{2}[.,]\d{3}) --> (\d{2}:\d{2}:\d{2}[.,]\d{3})(?: .*)?\n(.*?)\n\n",
-                re.DOTALL
-            )
-            
             segments = []
-            for match in pattern.finditer(vtt_content):
-                start_time, end_time, text = match.groups()
-                segments.append({
-                    "text": text.strip().replace('\n', ' '),
-                    "start_ms": self._vtt_time_to_ms(start_time),
-                    "end_ms": self._vtt_time_to_ms(end_time)
-                })
-            return segments
+            cue_start = cue_end = None
+            cue_lines: List[str] = []
+
+            def flush_cue():
+                if cue_start is not None and cue_lines:
+                    segments.append({
+                        "text": " ".join(cue_lines).strip(),
+                        "start_ms": cue_start,
+                        "end_ms": cue_end
+                    })
+
+            with requests.get(vtt_url, stream=True, timeout=30) as response:
+                response.raise_for_status() # HTTP hatası varsa exception fırlat
+                response.encoding = response.encoding or "utf-8"
+
+                for line in response.iter_lines(decode_unicode=True):
+                    line = line.strip()
+                    timing = VTT_TIMING_PATTERN.match(line)
+                    if timing:
+                        # TIMING: yeni cue başlıyor
+                        flush_cue()
+                        cue_start = self._vtt_time_to_ms(timing.group(1))
+                        cue_end = self._vtt_time_to_ms(timing.group(2))
+                        cue_lines = []
+                    elif not line:
+                        # Boş satır cue'yu kapatır
+                        flush_cue()
+                        cue_start = cue_end = None
+                        cue_lines = []
+                    elif cue_start is not None:
+                        # TEXT: zaman satırından sonraki metin satırları
+                        cue_lines.append(line)
+                    # HEADER (WEBVTT, NOTE, STYLE, cue kimlikleri): atlanır
+
+                flush_cue()
+            return self._dedup_rolling_cues(segments)
         except requests.RequestException as e:
             logger.error(f"VTT URL'sini indirirken hata oluştu: {e}")
             return []
@@ -131,65 +187,107 @@ class OnlineVideoProcessor:
             logger.error(f"Online video işlenirken hata oluştu: {e}")
             return None, None, None
 
+FFMPEG_BINARY = shutil.which("ffmpeg")
+WHISPER_SAMPLE_RATE = 16000
+
+
+def cuda_device_count() -> int:
+    """CUDA cihazı sayısı (CTranslate2'nin gördüğü); GPU yoksa 0."""
+    return ctranslate2.get_cuda_device_count()
+
 class LocalVideoProcessor:
+    # DEĞİŞTİ: openai-whisper yerine faster-whisper (CTranslate2). GPU'da int8_float16, CPU'da int8 ile çalışır.
     def __init__(self, model_size="medium"):
-        logger.info(f"Whisper modeli yükleniyor: {model_size}")
-        self.model = whisper.load_model(model_size)
+        device = "cuda" if cuda_device_count() > 0 else "cpu"
+        compute_type = "int8_float16" if device == "cuda" else "int8"
+        logger.info(f"Whisper modeli yükleniyor: {model_size} ({device}, {compute_type})")
+        self.model = WhisperModel(model_size, device=device, compute_type=compute_type)
         logger.info("Whisper modeli başarıyla yüklendi.")
 
+    def _load_audio_pcm(self, file_path: str):
+        """
+        Sesi ffmpeg ile doğrudan 16 kHz mono s16le PCM olarak stdout'tan okur ve float32 dizisine çevirir.
+        Ara dosya veya yeniden kodlama yok. ffmpeg kurulu değilse None döner (faster-whisper dosyayı kendisi çözer).
+        """
+        if not FFMPEG_BINARY:
+            return None
+        proc = subprocess.run(
+            [FFMPEG_BINARY, "-loglevel", "error", "-i", file_path,
+             "-vn", "-f", "s16le", "-ac", "1", "-ar", str(WHISPER_SAMPLE_RATE), "-"],
+            capture_output=True, check=True
+        )
+        return np.frombuffer(proc.stdout, np.int16).astype(np.float32) / 32768.0
+
     def get_transcript(self, file_path: str) -> Tuple[List[Dict], str, str]:
         logger.info(f"'{file_path}' adresindeki lokal video işleniyor...")
         if not os.path.exists(file_path):
             logger.error(f"Dosya bulunamadı: {file_path}")
             return None, None, None
         try:
-            video = VideoFileClip(file_path)
-            temp_audio_path = "temp_audio.mp3"
-            video.audio.write_audiofile(temp_audio_path, codec='mp3')
-            video.close()
-            logger.info("Videodan ses başarıyla ayrıştırıldı.")
+            audio = self._load_audio_pcm(file_path)
+            if audio is not None:
+                logger.info("Videodan ses PCM olarak ayrıştırıldı.")
 
             logger.info("Whisper ile transkripsiyon başlatılıyor...")
-            result = self.model.transcribe(temp_audio_path, verbose=False, word_timestamps=False)
-            logger.info("Transkripsiyon tamamlandı.")
+            segments, _ = self.model.transcribe(file_path if audio is None else audio, vad_filter=True, beam_size=1)
 
+            # segments bir generator: transkripsiyon bu döngüde ilerler.
             transcript_segments = []
-            for segment in result.get("segments", []):
+            for segment in segments:
                 transcript_segments.append({
-                    "text": segment["text"].strip(),
-                    "start_ms": int(segment["start"] * 1000),
-                    "end_ms": int(segment["end"] * 1000)
+                    "text": segment.text.strip(),
+                    "start_ms": int(segment.start * 1000),
+                    "end_ms": int(segment.end * 1000)
                 })
+            logger.info("Transkripsiyon tamamlandı.")
             
             video_title = os.path.basename(file_path)
             video_id = slugify(os.path.splitext(video_title)[0]) # Dosya adından ID oluştur
 
-            os.remove(temp_audio_path)
-            logger.info("Geçici ses dosyası silindi.")
-            
             return transcript_segments, video_title, video_id
         except Exception as e:
             logger.error(f"Lokal video işlenirken hata oluştu: {e}")
-            if 'temp_audio_path' in locals() and os.path.exists(temp_audio_path):
-                os.remove(temp_audio_path)
             return None, None, None
 
 # ========================================
 # 3. YENİ SINIF: RAG İÇİN VİDEO PARÇALAYICI (CHUNKER)
 # ========================================
+
+# Cümle: nokta, soru işareti veya ünlemle (ya da metnin sonuyla) biten en kısa metin parçası.
+SENTENCE_PATTERN = re.compile(r'\S.*?(?:[.?!](?=\s)|$)', re.DOTALL)
+WORD_PATTERN = re.compile(r'\S+')
+
 class VideoChunker:
-   
-    # DEĞİŞTİ: Artık karakter boyutuna göre değil, cümle sayısına göre çalışıyor.
-    def __init__(self, sentences_per_chunk: int = 5):
+
+    # Eski sentences_per_chunk parametresini token bütçesine çevirmek için ortalama cümle uzunluğu (kelime).
+    APPROX_TOKENS_PER_SENTENCE = 24
+
+    # DEĞİŞTİ: Cümle sayısı yerine token bütçesine göre, örtüşen (sliding window) chunk'lar üretiyor.
+    def __init__(self, chunk_tokens: int = 120, stride_ratio: float = 0.75,
+                 sentences_per_chunk: Optional[int] = None):
         """
         Args:
-            sentences_per_chunk (int): Her bir metin parçasında (chunk) bulunması gereken cümle sayısı.
+            chunk_tokens (int): Bir chunk'ın hedef token (kelime) bütçesi, K.
+            stride_ratio (float): Pencerenin her adımda ilerlediği oran; S = stride_ratio * K.
+                Kalan kısım bir sonraki chunk ile örtüşür, böylece cümle grupları sınırda bölünmez.
+            sentences_per_chunk (int, deprecated): Eski API. Verilirse
+                K = sentences_per_chunk * APPROX_TOKENS_PER_SENTENCE olarak yorumlanır.
         """
-        # LangChain'in text_splitter'ına artık bu sınıfta ihtiyacımız yok.
-        if sentences_per_chunk <= 0:
-            raise ValueError("sentences_per_chunk pozitif bir tamsayı olmalıdır.")
-        self.sentences_per_chunk = sentences_per_chunk
-        logger.info(f"VideoChunker başlatıldı: Her chunk için {self.sentences_per_chunk} cümle hedefleniyor.")
+        if sentences_per_chunk is not None:
+            warnings.warn("sentences_per_chunk kullanımdan kaldırıldı; chunk_tokens kullanın.",
+                          DeprecationWarning, stacklevel=2)
+            if sentences_per_chunk <= 0:
+                raise ValueError("sentences_per_chunk pozitif bir tamsayı olmalıdır.")
+            chunk_tokens = sentences_per_chunk * self.APPROX_TOKENS_PER_SENTENCE
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens pozitif bir tamsayı olmalıdır.")
+        if not 0 < stride_ratio <= 1:
+            raise ValueError("stride_ratio (0, 1] aralığında olmalıdır.")
+        self.chunk_tokens = chunk_tokens
+        self.stride_tokens = max(1, int(chunk_tokens * stride_ratio))
+        # Bu sınırdan uzun cümleler tek parça tutulmaz, K token'lık sabit parçalara bölünür.
+        self.max_sentence_tokens = 2 * chunk_tokens
+        logger.info(f"VideoChunker başlatıldı: K={self.chunk_tokens} token, stride={self.stride_tokens} token.")
 
     def _generate_timestamp_link(self, video_id: str, start_ms: int) -> str:
         """YouTube veya benzeri platformlar için zaman damgası linki oluşturur."""
@@ -197,73 +295,105 @@ class VideoChunker:
             return f"https://www.youtube.com/watch?v={video_id}&t={start_ms // 1000}s"
         return None
 
+    def _split_sentences(self, full_text: str) -> List[Tuple[int, int, int]]:
+        """
+        Metni cümlelere böler ve her cümle için (başlangıç karakteri, bitiş karakteri, token sayısı) döndürür.
+        Token sayısı kelime sayısıyla yaklaşıklanır. 2·K'dan uzun cümleler K kelimelik parçalara bölünür.
+        """
+        units = []
+        for sentence in SENTENCE_PATTERN.finditer(full_text):
+            words = list(WORD_PATTERN.finditer(full_text, sentence.start(), sentence.end()))
+            if not words:
+                continue
+            if len(words) <= self.max_sentence_tokens:
+                units.append((words[0].start(), words[-1].end(), len(words)))
+                continue
+            for i in range(0, len(words), self.chunk_tokens):
+                piece = words[i:i + self.chunk_tokens]
+                units.append((piece[0].start(), piece[-1].end(), len(piece)))
+        return units
+
+    def _attach_timestamps(self, units: List[Tuple[int, int, int]],
+                           segment_bounds: List[Tuple[int, int, int, int]]) -> List[Tuple[int, int, int, int, int]]:
+        """
+        Her cümleye, başladığı segmentin start_ms'ini ve bittiği segmentin end_ms'ini ekler.
+        Cümleler ve segmentler metin sırasında olduğu için tek bir ileri taramayla çözülür.
+        """
+        timed_units = []
+        start_seg = end_seg = 0
+        last_seg = len(segment_bounds) - 1
+        for start_char, end_char, tokens in units:
+            while start_seg < last_seg and segment_bounds[start_seg][1] <= start_char:
+                start_seg += 1
+            if end_seg < start_seg:
+                end_seg = start_seg
+            while end_seg < last_seg and segment_bounds[end_seg][1] < end_char:
+                end_seg += 1
+            timed_units.append((start_char, end_char, tokens, segment_bounds[start_seg][2], segment_bounds[end_seg][3]))
+        return timed_units
+
+    def _windows(self, units: List[Tuple[int, int, int, int, int]]) -> List[Tuple[int, int, int, int]]:
+        """
+        Cümleleri K token'a kadar açgözlü biçimde toplar; her chunk'tan sonra pencere yaklaşık S token kaydırılır.
+        Her chunk için (başlangıç karakteri, bitiş karakteri, start_ms, end_ms) döndürür.
+        """
+        windows = []
+        window = deque()
+        window_tokens = 0
+        last_emitted = -1  # Son chunk'a giren en son cümlenin indeksi
+
+        def emit():
+            first, last = window[0][1], window[-1][1]
+            windows.append((first[0], last[1], first[3], last[4]))
+
+        for index, unit in enumerate(units):
+            if window and window_tokens + unit[2] > self.chunk_tokens:
+                emit()
+                last_emitted = window[-1][0]
+                # En az bir cümle düşülür; S token'ı aşmadan düşülebilecek kadar cümle düşülür, kalanlar örtüşür.
+                dropped = window.popleft()[1][2]
+                while window and dropped + window[0][1][2] <= self.stride_tokens:
+                    dropped += window.popleft()[1][2]
+                window_tokens -= dropped
+                # Örtüşen kısım yeni cümleyle birlikte K'yı aşıyorsa, bütçeye sığana kadar düşmeye devam edilir.
+                while window and window_tokens + unit[2] > self.chunk_tokens:
+                    window_tokens -= window.popleft()[1][2]
+            window.append((index, unit))
+            window_tokens += unit[2]
+
+        # Son pencere yalnızca henüz hiçbir chunk'a girmemiş cümle içeriyorsa eklenir.
+        if window and window[-1][0] > last_emitted:
+            emit()
+        return windows
+
     def chunk_transcript(self, transcript_segments: List[Dict], video_id: str, video_title: str) -> List[Dict]:
         """
-        Transkripti alır ve RAG'e uygun, cümle bazlı chunk listesi döndürür.
+        Transkripti alır ve RAG'e uygun, cümle sınırlarına saygılı, örtüşen chunk listesi döndürür.
         """
         if not transcript_segments:
             logger.warning("Parçalanacak transkript segmenti bulunamadı.")
             return []
 
-        # Önceki versiyondaki gibi, zaman damgalarını bulmak için metni ve haritayı oluştur
-        full_text = ""
-        char_to_time_map = []
+        # Tam metni ve her segmentin (başlangıç karakteri, bitiş karakteri, start_ms, end_ms) sınırlarını tek geçişte oluştur
+        texts = []
+        segment_bounds = []
         current_char_index = 0
         for segment in transcript_segments:
             text = segment['text']
-            start_ms = segment['start_ms']
-            end_ms = segment['end_ms']
-            
-            full_text += text + " "
-            
-            segment_char_len = len(text) + 1 
-            char_to_time_map.append((current_char_index, current_char_index + segment_char_len, start_ms, end_ms))
+            texts.append(text)
+            segment_char_len = len(text) + 1
+            segment_bounds.append((current_char_index, current_char_index + segment_char_len,
+                                   segment['start_ms'], segment['end_ms']))
             current_char_index += segment_char_len
-            
-        # YENİ MANTIK: LangChain splitter yerine metni cümlelere böl
-        # Cümlelere ayırmak için regex. Nokta, soru işareti, ünlem sonrasındaki boşlukları hedefler.
-        sentence_ending_pattern = r'(?<=[.?!])\s+'
-        sentences = [s.strip() for s in re.split(sentence_ending_pattern, full_text) if s.strip()]
-
-        chunks = []
-        last_char_pos = 0
-        
-        # YENİ MANTIK: Cümleleri istenen sayıda grupla
-        for i in range(0, len(sentences), self.sentences_per_chunk):
-            sentence_group = sentences[i:i + self.sentences_per_chunk]
-            chunk_text = " ".join(sentence_group)
-
-            # Bu yeni chunk metninin tam metindeki yerini ve zaman damgalarını bul
-            try:
-                chunk_start_char = full_text.index(chunk_text, last_char_pos)
-            except ValueError:
-                logger.warning(f"Chunk metni tam olarak bulunamadı. Yaklaşık pozisyon kullanılıyor: {chunk_text[:50]}...")
-                chunk_start_char = last_char_pos
-            
-            chunk_end_char = chunk_start_char + len(chunk_text)
-            last_char_pos = chunk_start_char # Bir sonraki arama için pozisyonu güncelle (örtüşmeyi önler)
-
-            chunk_start_ms = -1
-            chunk_end_ms = -1
+        full_text = " ".join(texts) + " "
 
-            # Başlangıç zamanını bul
-            for start_char, end_char, seg_start_ms, _ in char_to_time_map:
-                if chunk_start_char >= start_char and chunk_start_char < end_char:
-                    chunk_start_ms = seg_start_ms
-                    break
-            
-            # Bitiş zamanını bul
-            for start_char, end_char, _, seg_end_ms in reversed(char_to_time_map):
-                if chunk_end_char > start_char:
-                    chunk_end_ms = seg_end_ms
-                    break
-
-            if chunk_start_ms == -1 and transcript_segments: chunk_start_ms = transcript_segments[0]['start_ms']
-            if chunk_end_ms == -1 and transcript_segments: chunk_end_ms = transcript_segments[-1]['end_ms']
+        sentence_units = self._attach_timestamps(self._split_sentences(full_text), segment_bounds)
 
+        chunks = []
+        for chunk_start_char, chunk_end_char, chunk_start_ms, chunk_end_ms in self._windows(sentence_units):
             chunks.append({
                 'chunk_index': len(chunks),
-                'text': chunk_text,
+                'text': full_text[chunk_start_char:chunk_end_char],
                 'start_ms': chunk_start_ms,
                 'end_ms': chunk_end_ms,
                 'metadata': {
@@ -273,5 +403,5 @@ class VideoChunker:
                 }
             })
             
-        logger.info(f"'{video_title}' için {len(transcript_segments)} segment ve {len(sentences)} cümle, {len(chunks)} chunk'a bölündü.")
-        return chunks
\ No newline at end of file
+        logger.info(f"'{video_title}' için {len(transcript_segments)} segment ve {len(sentence_units)} cümle, {len(chunks)} chunk'a bölündü.")
+        return chunks
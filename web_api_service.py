@@ -1,24 +1,34 @@
 import os
+import json
 import logging
 import re
+import shutil
+import sqlite3
+import subprocess
 import uuid
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Optional
+from typing import Iterator, List, Dict, Any, Tuple, Optional
 import time
-import threading
+import asyncio
+import hashlib
 import dotenv
+import orjson
 from slugify import slugify
-from functools import lru_cache
-from moviepy.editor import VideoFileClip
+from contextlib import closing
+from functools import cache
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
 
 from fastapi import FastAPI, Request, HTTPException, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
-dotenv.load_dotenv()
+# Existing environment variables win over .env (override=False).
+dotenv.load_dotenv(override=False)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -29,56 +39,216 @@ logger = logging.getLogger(__name__)
 
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
-if not os.getenv("GOOGLE_API_KEY"):
-    logger.warning("GOOGLE_API_KEY not found in environment variables. Using fallback method...")
-    env_path = Path(".env")
-    if env_path.exists():
-        with open(env_path, "r") as f:
-            for line in f:
-                if line.strip().startswith("GOOGLE_API_KEY="):
-                    key = line.strip().split("=", 1)[1].strip().strip('"').strip("'")
-                    os.environ["GOOGLE_API_KEY"] = key
-                    logger.info("GOOGLE_API_KEY loaded from .env file")
-                    break
+# The key does not change after startup; endpoints check these instead of reading the environment per request.
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+GOOGLE_API_KEY_SET = bool(GOOGLE_API_KEY)
 
-if os.getenv("GOOGLE_API_KEY"):
-    api_key = os.getenv("GOOGLE_API_KEY")
-    masked_key = f"{api_key[:5]}...{api_key[-5:]}" if len(api_key) > 10 else "***"
+if GOOGLE_API_KEY_SET:
+    masked_key = f"{GOOGLE_API_KEY[:5]}...{GOOGLE_API_KEY[-5:]}" if len(GOOGLE_API_KEY) > 10 else "***"
     logger.info(f"GOOGLE_API_KEY is set (masked: {masked_key})")
 else:
-    logger.error("GOOGLE_API_KEY is still not set! Application may not work correctly.")
+    logger.error("GOOGLE_API_KEY is not set in the environment or .env! Application may not work correctly.")
 
 app = FastAPI(
     title="SterkAgents Web Service",
     description="Web service for SterkAgents RAG video education platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
+class MediaSkippingGZipMiddleware(GZipMiddleware):
+    """GZip for everything except the video files: MP4/JPEG do not shrink and range requests must stay byte-exact."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/Education_video/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# VIDEO_LIST and source chunks are text-heavy JSON; small responses are not worth compressing.
+# Level 5 keeps most of the size win at a fraction of the CPU of the default level 9.
+app.add_middleware(MediaSkippingGZipMiddleware, minimum_size=1024, compresslevel=5)
+
+FFPROBE_BINARY = shutil.which("ffprobe")
+
+def _probe_duration_seconds(video_path: str) -> float:
+    """Read the container duration; ffprobe parses only the header, MoviePy is the fallback without it."""
+    if FFPROBE_BINARY:
+        proc = subprocess.run(
+            [FFPROBE_BINARY, "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=nw=1:nk=1", video_path],
+            capture_output=True, text=True, timeout=5
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip() or f"ffprobe exited with code {proc.returncode}")
+        return float(proc.stdout.strip())
+
+    from moviepy.editor import VideoFileClip
+    with VideoFileClip(video_path) as video:
+        return video.duration
+
+def _format_duration(duration_seconds: int) -> Tuple[int, str]:
+    minutes = duration_seconds // 60
+    seconds = duration_seconds % 60
+    return duration_seconds, f"{minutes}d {seconds}sn"
 
-@lru_cache(maxsize=200)
+# Unbounded: one entry per video file, and an evicted entry would cost another probe.
+@cache
 def get_video_duration(video_path: str) -> Tuple[int, str]:
     try:
         if not Path(video_path).exists():
             logger.warning(f"Video file not found for duration calculation: {video_path}")
             return 0, "N/A"
         
-        with VideoFileClip(video_path) as video:
-            duration_seconds = int(video.duration)
-        
-        minutes = duration_seconds // 60
-        seconds = duration_seconds % 60
-        formatted_duration = f"{minutes}d {seconds}sn"
-        
-        return duration_seconds, formatted_duration
+        return _format_duration(int(_probe_duration_seconds(video_path)))
     except Exception as e:
         logger.error(f"Error getting video duration for {video_path}: {e}")
         return 0, "N/A"
 
+FFMPEG_BINARY = shutil.which("ffmpeg")
+# Inputs per ffmpeg call; keeps the command line well below OS argument limits.
+DURATION_BATCH_SIZE = 64
+_FFMPEG_INPUT_RE = re.compile(r"^Input #(\d+),")
+_FFMPEG_DURATION_RE = re.compile(r"^\s+Duration: (\d+):(\d{2}):(\d{2})")
+
+def probe_durations_batch(paths: List[str]) -> List[Tuple[int, str]]:
+    """
+    get_video_duration for many files with one process per DURATION_BATCH_SIZE files.
+    ffprobe accepts a single input, so this runs "ffmpeg -i a -i b ..." without an output: ffmpeg
+    prints the header of every input to stderr and exits. Files it did not report are probed one by one.
+    """
+    durations: Dict[int, Tuple[int, str]] = {}
+    if FFMPEG_BINARY:
+        for offset in range(0, len(paths), DURATION_BATCH_SIZE):
+            batch = paths[offset:offset + DURATION_BATCH_SIZE]
+            command = [FFMPEG_BINARY, "-hide_banner", "-nostdin"]
+            for path in batch:
+                command += ["-i", path]
+            try:
+                # Exits non-zero ("At least one output file must be specified"); only stderr matters.
+                stderr = subprocess.run(command, capture_output=True, text=True, errors="replace", timeout=60).stderr
+            except subprocess.TimeoutExpired:
+                logger.warning(f"Batch duration probe timed out for {len(batch)} files")
+                continue
+            current = None
+            for line in stderr.splitlines():
+                input_match = _FFMPEG_INPUT_RE.match(line)
+                if input_match:
+                    current = offset + int(input_match.group(1))
+                    continue
+                duration_match = _FFMPEG_DURATION_RE.match(line)
+                if duration_match and current is not None:
+                    hours, minutes, seconds = map(int, duration_match.groups())
+                    durations[current] = _format_duration(hours * 3600 + minutes * 60 + seconds)
+                    current = None
+
+    # An unreadable file stops ffmpeg at that input; the rest of the batch goes through the per-file path.
+    return [durations[i] if i in durations else get_video_duration(path) for i, path in enumerate(paths)]
+
+# Probed durations survive restarts; a row is reused while the file's mtime and size are unchanged.
+DURATION_CACHE_PATH = os.path.join(".cache", "video_durations.sqlite")
+# Stay below SQLite's default bound-parameter limit for the IN (...) lookups.
+_DURATION_LOOKUP_BATCH_SIZE = 500
+
+def _connect_duration_cache() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DURATION_CACHE_PATH), exist_ok=True)
+    # Short-lived connections: every worker process builds its own video list on import.
+    conn = sqlite3.connect(DURATION_CACHE_PATH, timeout=30)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS durations ("
+        "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, secs INTEGER NOT NULL)"
+    )
+    return conn
+
+def _file_signatures(paths: List[str]) -> Dict[str, Tuple[int, int]]:
+    signatures = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signatures[path] = (stat.st_mtime_ns, stat.st_size)
+    return signatures
+
+def load_cached_durations(paths: List[str]) -> Dict[str, Tuple[int, str]]:
+    """Durations from the disk cache for the files whose (mtime_ns, size) still match."""
+    signatures = _file_signatures(paths)
+    cached = {}
+    try:
+        with closing(_connect_duration_cache()) as conn:
+            lookup_paths = list(signatures)
+            for start in range(0, len(lookup_paths), _DURATION_LOOKUP_BATCH_SIZE):
+                lookup = lookup_paths[start:start + _DURATION_LOOKUP_BATCH_SIZE]
+                placeholders = ", ".join("?" * len(lookup))
+                rows = conn.execute(
+                    f"SELECT path, mtime_ns, size, secs FROM durations WHERE path IN ({placeholders})", lookup
+                ).fetchall()
+                for path, mtime_ns, size, secs in rows:
+                    if signatures[path] == (mtime_ns, size):
+                        cached[path] = _format_duration(secs)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read the duration cache: {e}")
+    return cached
+
+def store_durations(durations: Dict[str, Tuple[int, str]]) -> None:
+    # Failed probes ("N/A") are left out so they are retried on the next start.
+    signatures = _file_signatures([path for path, (_, formatted) in durations.items() if formatted != "N/A"])
+    rows = [(path, mtime_ns, size, durations[path][0]) for path, (mtime_ns, size) in signatures.items()]
+    if not rows:
+        return
+    try:
+        with closing(_connect_duration_cache()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO durations (path, mtime_ns, size, secs) VALUES (?, ?, ?, ?)", rows)
+    except sqlite3.Error as e:
+        logger.warning(f"Could not write the duration cache: {e}")
+
+_LEADING_NUM_RE = re.compile(r'\s*(\d+)')
+
 def extract_leading_number(filename: str) -> int:
-    match = re.match(r'^\s*(\d+)', filename)
+    match = _LEADING_NUM_RE.match(filename)
     if match:
         return int(match.group(1))
     return float('inf')
 
+# How many directory levels below a course are scanned. 0 (default) scans the whole tree; deployments with a
+# flat layout (Education_video/<course>/<videos>) can set 1 to skip unrelated subfolders.
+# A course with no .mp4 within SCAN_DEPTH is rescanned without the limit.
+SCAN_DEPTH = int(os.getenv("EDU_SCAN_DEPTH", "0"))
+
+def _scandir_files(root: str, max_depth: int = 0) -> Iterator[os.DirEntry]:
+    """
+    Yield every file below root, at most max_depth levels deep (0: no limit);
+    DirEntry already knows its type, so no extra stat() per entry.
+    """
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if max_depth != 1:
+                    yield from _scandir_files(entry.path, max(max_depth - 1, 0))
+            elif entry.is_file():
+                yield entry
+
+# Thumbnail candidates in order of preference; the first file found of the best available kind is used.
+THUMBNAIL_EXTENSIONS = ((".jpg", ".jpeg"), (".png", ".webp"))
+
+def _scan_course_files(course_dir: str, max_depth: int) -> Tuple[List[os.DirEntry], Optional[os.DirEntry]]:
+    """One scandir pass: the course videos and its thumbnail (the first .jpg/.jpeg, else the first .png/.webp)."""
+    video_files = []
+    thumbnails: List[Optional[os.DirEntry]] = [None] * len(THUMBNAIL_EXTENSIONS)
+    for entry in _scandir_files(course_dir, max_depth):
+        name = entry.name.lower()
+        if name.endswith(".mp4"):
+            video_files.append(entry)
+            continue
+        for rank, extensions in enumerate(THUMBNAIL_EXTENSIONS):
+            if thumbnails[rank] is None and name.endswith(extensions):
+                thumbnails[rank] = entry
+                break
+    return video_files, next((entry for entry in thumbnails if entry is not None), None)
+
+def _course_file_url(url_prefix: str, course_path: str, entry: os.DirEntry) -> str:
+    """URL of a file below a course directory; relative to the course, so files in subfolders still resolve."""
+    return url_prefix + quote(os.path.relpath(entry.path, course_path).replace(os.sep, "/"))
+
 def create_video_list() -> List[Dict[str, Any]]:
     videos = []
     root_dir = Path("Education_video")
@@ -87,25 +257,26 @@ def create_video_list() -> List[Dict[str, Any]]:
         logger.warning("Education_video directory not found")
         return videos
 
-    for course_dir in sorted(root_dir.iterdir()):
-        if not course_dir.is_dir():
-            continue
-
+    # First pass: discover courses and their videos; durations are probed afterwards in one parallel batch.
+    courses = []
+    # DirEntry.is_dir() answers from the directory listing, so no stat() per course.
+    with os.scandir(root_dir) as entries:
+        course_dirs = sorted((entry for entry in entries if entry.is_dir()), key=lambda entry: entry.name)
+    for course_dir in course_dirs:
         course_name = course_dir.name
         course_id = f"course_{slugify(course_name)}"
         collection_name = course_name.lower().replace(" ", "_")
-        encoded_course_name = quote(course_name)
+        # Every URL of the course shares this prefix; course names may contain Turkish characters and spaces
+        url_prefix = "/Education_video/" + quote(course_name) + "/"
 
-        video_files = sorted(
-            [p for p in course_dir.glob("**/*.mp4") if p.is_file()],
-            key=lambda x: extract_leading_number(x.name)
-        )
+        video_files, thumbnail_file = _scan_course_files(course_dir, SCAN_DEPTH)
+        if not video_files and SCAN_DEPTH:
+            video_files, thumbnail_file = _scan_course_files(course_dir, 0)
+        video_files.sort(key=lambda entry: extract_leading_number(entry.name))
         
         is_series = len(video_files) > 1
-        thumbnail_files = list(course_dir.glob("**/*.jpg")) + list(course_dir.glob("**/*.png"))
-        if thumbnail_files and len(thumbnail_files) > 0:
-            encoded_thumbnail_name = quote(thumbnail_files[0].name)
-            thumbnail = f"/Education_video/{encoded_course_name}/{encoded_thumbnail_name}"
+        if thumbnail_file:
+            thumbnail = _course_file_url(url_prefix, course_dir.path, thumbnail_file)
         else:
             thumbnail = None
 
@@ -119,49 +290,127 @@ def create_video_list() -> List[Dict[str, Any]]:
         }
 
         if video_files:
-            main_video = video_files[0]
-            # Properly encode the video URL for Turkish characters and spaces
-            encoded_video_name = quote(main_video.name)
-            video_path_url = f"/Education_video/{encoded_course_name}/{encoded_video_name}"
-            course_info["video_url"] = video_path_url
-            if thumbnail:
-                course_info["thumbnail"] = thumbnail
-
-            series_videos = []
-            total_duration_seconds = 0
+            courses.append((course_info, course_name, course_dir.path, url_prefix, thumbnail, video_files))
+
+    # The probes block on a subprocess, so threads overlap them.
+    course_paths = [[os.path.abspath(video_file.path) for video_file in video_files] for *_, video_files in courses]
+    duration_by_path = load_cached_durations([path for paths in course_paths for path in paths])
+    missing = [path for paths in course_paths for path in paths if path not in duration_by_path]
+    if missing:
+        # Spread the uncached files evenly over the workers, so one large course does not end up in a
+        # single serial ffmpeg call, while each call still covers several files.
+        max_workers = min(32, (os.cpu_count() or 1) * 4)
+        batch_size = min(DURATION_BATCH_SIZE, -(-len(missing) // max_workers))
+        batches = [missing[start:start + batch_size] for start in range(0, len(missing), batch_size)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            probed = {
+                path: duration
+                for paths, batch in zip(batches, executor.map(probe_durations_batch, batches))
+                for path, duration in zip(paths, batch)
+            }
+        store_durations(probed)
+        duration_by_path.update(probed)
+    durations = iter([duration_by_path[path] for paths in course_paths for path in paths])
+
+    for course_info, course_name, course_path, url_prefix, thumbnail, video_files in courses:
+        collection_name = course_info["collection_name"]
+        course_info["video_url"] = _course_file_url(url_prefix, course_path, video_files[0])
+        if thumbnail:
+            course_info["thumbnail"] = thumbnail
+
+        series_videos = []
+        total_duration_seconds = 0
+        
+        for idx, video_file in enumerate(video_files):
+            video_name = os.path.splitext(video_file.name)[0]
+            video_path = _course_file_url(url_prefix, course_path, video_file)
             
-            for idx, video_file in enumerate(video_files):
-                video_name = video_file.stem
-                # Properly encode the video path for Turkish characters and spaces
-                encoded_video_name = quote(video_file.name)
-                video_path = f"/Education_video/{encoded_course_name}/{encoded_video_name}"
-                full_path = str(video_file.resolve())
-                
-                duration_seconds, duration = get_video_duration(full_path)
-                total_duration_seconds += duration_seconds
-                
-                series_videos.append({
-                    "title": video_name,
-                    "video_path": video_path,
-                    "collection_name": collection_name,
-                    "original_dir_name": course_name,
-                    "index": idx,
-                    "duration": duration
-                })
+            duration_seconds, duration = next(durations)
+            total_duration_seconds += duration_seconds
             
-            total_minutes = total_duration_seconds // 60
-            total_seconds = total_duration_seconds % 60
-            total_duration = f"{total_minutes}d {total_seconds}sn"
-            course_info["total_duration"] = total_duration
-            course_info["series_videos_data"] = series_videos
-            course_info["video_count"] = len(video_files)
+            series_videos.append({
+                "title": video_name,
+                "video_path": video_path,
+                "collection_name": collection_name,
+                "original_dir_name": course_name,
+                "index": idx,
+                "duration": duration
+            })
+        
+        total_minutes = total_duration_seconds // 60
+        total_seconds = total_duration_seconds % 60
+        total_duration = f"{total_minutes}d {total_seconds}sn"
+        course_info["total_duration"] = total_duration
+        course_info["series_videos_data"] = series_videos
+        course_info["video_count"] = len(video_files)
 
-            videos.append(course_info)
-            logger.info(f"Added course '{course_name}' with {len(video_files)} videos")
+        videos.append(course_info)
+        logger.info(f"Added course '{course_name}' with {len(video_files)} videos")
 
     return videos
 
-from query_manager import QueryManager, is_valid_collection, find_latest_collection_uuid, get_collection_dir
+VIDEO_LIST_CACHE_PATH = Path(".video_list_cache.json")
+# Bump whenever create_video_list() changes its output, so caches written by older code are rebuilt.
+VIDEO_LIST_CACHE_VERSION = 2
+
+def _video_tree_signature(root: str) -> List[int]:
+    """(entry count, newest mtime_ns) over root and everything below it; any add/remove/rename/edit changes it."""
+    count = 0
+    newest_mtime_ns = os.stat(root).st_mtime_ns
+    pending = [root]
+    while pending:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                count += 1
+                newest_mtime_ns = max(newest_mtime_ns, entry.stat(follow_symlinks=False).st_mtime_ns)
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+    return [count, newest_mtime_ns]
+
+def load_video_list() -> List[Dict[str, Any]]:
+    """
+    create_video_list() with a JSON cache on disk. The cache is reused while the Education_video
+    tree signature is unchanged, so reloads skip the directory scan and the ffprobe calls.
+    """
+    root_dir = "Education_video"
+    if not os.path.isdir(root_dir):
+        return create_video_list()
+
+    # The scan settings are part of the key: a list built under another EDU_SCAN_DEPTH or format is not reused.
+    signature = [VIDEO_LIST_CACHE_VERSION, SCAN_DEPTH, *_video_tree_signature(root_dir)]
+    try:
+        with open(VIDEO_LIST_CACHE_PATH, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("signature") == signature:
+            logger.info(f"Video list loaded from cache ({len(cached['videos'])} courses)")
+            return cached["videos"]
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    videos = create_video_list()
+    try:
+        tmp_path = VIDEO_LIST_CACHE_PATH.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"signature": signature, "videos": videos}, f, ensure_ascii=False)
+        os.replace(tmp_path, VIDEO_LIST_CACHE_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write video list cache: {e}")
+    return videos
+
+from query_manager import (
+    get_query_manager, evict_query_manager, is_valid_collection, find_latest_collection_uuid, get_collection_dir,
+    get_collection_statuses, get_shared_embeddings, get_shared_llm
+)
+
+@cache
+def _rag_classes() -> Tuple[Any, Any]:
+    """
+    Import the build pipeline lazily: app pulls in Whisper/ctranslate2 and the embedding stack, which the
+    web service would otherwise pay for at import. Preloaded by the startup hook, so no request waits on it.
+    """
+    from app import VideoProcessingService
+    from create_vector_store import RAGVectorStoreManager
+    return VideoProcessingService, RAGVectorStoreManager
 
 def ensure_collection_exists(collection_name: str) -> Dict[str, Any]:
     """
@@ -195,8 +444,7 @@ def ensure_collection_exists(collection_name: str) -> Dict[str, Any]:
                 "collection_path": None
             }
         
-        from app import VideoProcessingService
-        from create_vector_store import RAGVectorStoreManager
+        VideoProcessingService, RAGVectorStoreManager = _rag_classes()
         
         logger.info(f"Processing course directory for collection '{collection_name}': {course_dir}")
         start_time = time.time()
@@ -231,6 +479,10 @@ def ensure_collection_exists(collection_name: str) -> Dict[str, Any]:
         rag_manager = RAGVectorStoreManager(persist_directory=str(collection_uuid_path))
         rag_manager.create_and_persist_store(chunks)
         
+        # A manager cached before the rebuild still points at the previous UUID directory.
+        evict_query_manager(collection_name)
+        invalidate_video_list_json()
+        
         elapsed_time = time.time() - start_time
         chunks_count = len(chunks)
         logger.info(f"Course collection '{collection_name}/{collection_uuid}' created in {elapsed_time:.2f} seconds with {chunks_count} chunks")
@@ -250,19 +502,41 @@ def ensure_collection_exists(collection_name: str) -> Dict[str, Any]:
             "collection_path": None
         }
 
-@lru_cache(maxsize=50)
+# In-flight collection builds per collection name; concurrent callers await the same build.
+# Only touched from the event loop thread, so no extra lock is needed.
+_collection_builds: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+def _forget_collection_build(collection_name: str, build: "asyncio.Task[Dict[str, Any]]") -> None:
+    if _collection_builds.get(collection_name) is build:
+        del _collection_builds[collection_name]
+    if not build.cancelled():
+        # Mark it retrieved; waiters (if any) get it re-raised from their own await.
+        build.exception()
+
+async def ensure_collection_once(collection_name: str) -> Dict[str, Any]:
+    """Run ensure_collection_exists in the threadpool, sharing one build between concurrent requests."""
+    build = _collection_builds.get(collection_name)
+    if build is None:
+        # The registry owns the build: it stays registered until the thread finishes, whoever gives up waiting.
+        build = asyncio.ensure_future(run_in_threadpool(ensure_collection_exists, collection_name))
+        _collection_builds[collection_name] = build
+        build.add_done_callback(lambda task: _forget_collection_build(collection_name, task))
+    else:
+        logger.info(f"Collection '{collection_name}' is already being built, waiting for it")
+    # shield: a cancelled waiter, the first one included, must not cancel the build the others wait on
+    return await asyncio.shield(build)
+
+@cache
+def _education_dir_names() -> Dict[str, str]:
+    """{collection_name: directory name} for Education_video/, scanned once for names missing from VIDEO_LIST."""
+    try:
+        with os.scandir("Education_video") as entries:
+            return {entry.name.lower().replace(" ", "_"): entry.name for entry in entries if entry.is_dir()}
+    except FileNotFoundError:
+        return {}
+
 def find_original_dir_name(collection_name: str) -> str:
-    for video in VIDEO_LIST:
-        if video.get("collection_name") == collection_name:
-            return video.get("original_dir_name", collection_name)
-    
-    education_dir = Path("Education_video")
-    if education_dir.exists():
-        for dir_path in education_dir.iterdir():
-            if dir_path.is_dir() and dir_path.name.lower().replace(" ", "_") == collection_name:
-                return dir_path.name
-    
-    return collection_name
+    return COLLECTION_TO_DIR.get(collection_name) or _education_dir_names().get(collection_name, collection_name)
 
 
 
@@ -274,7 +548,98 @@ class QuestionRequest(BaseModel):
     collection_name: str
     question: str
 
-VIDEO_LIST = create_video_list()
+ASK_TIMEOUT_SECONDS = 30.0
+
+# Filled by the startup task instead of at import, so workers accept requests while the list is built.
+VIDEO_LIST: List[Dict[str, Any]] = []
+COLLECTION_TO_DIR: Dict[str, str] = {}
+# Set once VIDEO_LIST is loaded; created in the startup hook so it belongs to the server's event loop.
+_video_list_ready: Optional[asyncio.Event] = None
+
+def _set_video_list(videos: List[Dict[str, Any]]) -> None:
+    global VIDEO_LIST, COLLECTION_TO_DIR
+    COLLECTION_TO_DIR = {video["collection_name"]: video["original_dir_name"] for video in videos}
+    VIDEO_LIST = videos
+    invalidate_video_list_json()
+
+# Serialized /api/videolar body and its ETag; None until first request and after a collection build changes the flags.
+_video_list_json: Optional[Tuple[bytes, str]] = None
+
+def build_video_list_json() -> Tuple[bytes, str]:
+    """
+    Serialize VIDEO_LIST once with the current collection flags attached. The flags are not part of
+    the cached VIDEO_LIST since they change when a build finishes; the client then needs no
+    /api/check-collection calls.
+    """
+    global _video_list_json
+    statuses = get_collection_statuses([video["collection_name"] for video in VIDEO_LIST])
+    body = orjson.dumps([
+        {
+            **video,
+            "collection_exists": statuses[video["collection_name"]]["exists"],
+            "collection_uuid": statuses[video["collection_name"]]["uuid"],
+        }
+        for video in VIDEO_LIST
+    ])
+    etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    _video_list_json = (body, etag)
+    return _video_list_json
+
+def invalidate_video_list_json() -> None:
+    global _video_list_json
+    _video_list_json = None
+
+@app.on_event("startup")
+async def preload_rag_pipeline():
+    try:
+        await asyncio.to_thread(_rag_classes)
+    except Exception as e:
+        # A broken pipeline import should not take the video pages down; builds report it when they run.
+        logger.warning(f"Could not preload the RAG pipeline: {e}")
+
+# Collections whose QueryManager is opened at startup, in VIDEO_LIST order.
+WARMUP_COLLECTIONS = 3
+
+def _warm_query_path() -> None:
+    """
+    Serialize the /api/videolar body, load the embedding client/model and the LLM client,
+    then open the first ready collections.
+    """
+    build_video_list_json()
+    get_shared_embeddings()
+    get_shared_llm()
+    statuses = get_collection_statuses(list(COLLECTION_TO_DIR))
+    ready = [name for name, status in statuses.items() if status["exists"]]
+    for collection_name in ready[:WARMUP_COLLECTIONS]:
+        try:
+            get_query_manager(collection_name)
+            logger.info(f"Warmed query manager for collection '{collection_name}'")
+        except Exception as e:
+            logger.warning(f"Could not warm collection '{collection_name}': {e}")
+
+_warmup_task: Optional["asyncio.Task[None]"] = None
+
+@app.on_event("startup")
+async def warm_on_startup():
+    global _warmup_task, _video_list_ready
+    _video_list_ready = asyncio.Event()
+
+    async def warm():
+        try:
+            _set_video_list(await run_in_threadpool(load_video_list))
+            logger.info(f"Video list ready with {len(VIDEO_LIST)} courses")
+        except Exception as e:
+            logger.exception(f"Video list could not be generated: {e}")
+        finally:
+            _video_list_ready.set()
+
+        try:
+            await run_in_threadpool(_warm_query_path)
+        except Exception as e:
+            logger.warning(f"Query path warmup failed: {e}")
+
+    # Not awaited: the server starts accepting requests while the list is built and the models load.
+    _warmup_task = asyncio.create_task(warm())
 
 @app.get("/", response_class=HTMLResponse)
 async def get_index_page(request: Request):
@@ -291,94 +656,167 @@ async def get_video_page(request: Request):
     return response
 
 @app.get("/api/videolar")
-async def get_videos():
+async def get_videos(request: Request):
+    if _video_list_ready is not None:
+        await _video_list_ready.wait()
     if not VIDEO_LIST:
         logger.error("Video list could not be generated at startup.")
-        return JSONResponse(content=[])
+        return ORJSONResponse(content=[])
     
-    response = JSONResponse(content=VIDEO_LIST)
-    response.headers["Cache-Control"] = "public, max-age=600"
-    return response
+    payload = _video_list_json
+    if payload is None:
+        payload = await run_in_threadpool(build_video_list_json)
+    body, etag = payload
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=600"}
+    # Revalidation after max-age: unchanged list costs a 304 instead of the full body
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _existing_collection_info(collection_name: str) -> Optional[Dict[str, Any]]:
+    """The "exists" response for a valid collection, None otherwise; blocking, call it off the event loop."""
+    collection_path = get_collection_dir(collection_name)
+    if not is_valid_collection(collection_path):
+        return None
+    latest_uuid = find_latest_collection_uuid(collection_path)
+    return {
+        "status": "exists",
+        "message": f"Collection '{collection_name}' already exists",
+        "collection_path": str(collection_path / latest_uuid) if latest_uuid else str(collection_path),
+        "collection_uuid": latest_uuid
+    }
+
+async def _answer_question(collection_name: str, question: str) -> ORJSONResponse:
+    try:
+        query_manager = await run_in_threadpool(get_query_manager, collection_name)
+        
+        # aask keeps blocking work off the event loop; wait_for cancels it on timeout instead of leaking a thread.
+        try:
+            result = await asyncio.wait_for(query_manager.aask(question), timeout=ASK_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            return ORJSONResponse(content={
+                "answer": "Yanıt oluşturulurken zaman aşımı oluştu. Lütfen daha kısa bir soru sorun veya daha sonra tekrar deneyin.",
+                "sources": []
+            })
+
+        # Convert Document objects to serializable format
+        source_documents = []
+        for doc in result.get("source_documents", []):
+            source_documents.append({
+                "page_content": doc.page_content,
+                "metadata": doc.metadata
+            })
+        
+        return ORJSONResponse(content={
+            "answer": result.get("answer", ""),
+            "sources": source_documents
+        })
+        
+    except Exception as query_error:
+        logger.exception(f"Error querying collection: {query_error}")
+        return ORJSONResponse(content={
+            "answer": f"Sorgunuz işlenirken bir hata oluştu: {str(query_error)}",
+            "sources": []
+        })
 
 @app.post("/api/asistana-sor")
 async def ask_assistant(request: QuestionRequest, background_tasks: BackgroundTasks):
     try:
         logger.info(f"Asking question to collection '{request.collection_name}': {request.question}")
 
-        if not os.getenv("GOOGLE_API_KEY"):
-            return JSONResponse(status_code=400, content={"answer": "Google API anahtarı bulunamadı.", "sources": []})
+        if not GOOGLE_API_KEY_SET:
+            return ORJSONResponse(status_code=400, content={"answer": "Google API anahtarı bulunamadı.", "sources": []})
 
-        collection_path = get_collection_dir(request.collection_name)
-        
-        if not is_valid_collection(collection_path):
+        if await run_in_threadpool(_existing_collection_info, request.collection_name) is None:
             logger.info(f"Collection '{request.collection_name}' not found or invalid, starting background creation")
             # Önce koleksiyon oluşturma işlemini başlat
-            result = ensure_collection_exists(request.collection_name)
+            result = await ensure_collection_once(request.collection_name)
             
             # Eğer koleksiyon zaten varsa (başka bir isimle), hemen yanıt ver
             if result["status"] == "exists":
                 logger.info(f"Collection found with different name, using existing collection")
-                query_manager = QueryManager(collection_name=request.collection_name)
-                result = query_manager.ask(request.question)
-                return JSONResponse(content={
-                    "answer": result.get("answer", ""),
-                    "sources": result.get("source_documents", [])
-                })
+                return await _answer_question(request.collection_name, request.question)
             
             # Koleksiyon yoksa arka planda oluştur
-            background_tasks.add_task(ensure_collection_exists, request.collection_name)
-            return JSONResponse(content={
+            background_tasks.add_task(ensure_collection_once, request.collection_name)
+            return ORJSONResponse(content={
                 "answer": "Bu eğitim için veritabanı hazırlanıyor. Bu işlem birkaç dakika sürebilir. Lütfen biraz bekledikten sonra tekrar sorunuzu sorun.",
                 "sources": [],
                 "status": "processing"
             })
 
-        try:
-            query_manager = QueryManager(collection_name=request.collection_name)
-            
-            result = None
-            result_thread = threading.Thread(target=lambda: setattr(threading.current_thread(), "result", query_manager.ask(request.question)))
-            result_thread.daemon = True
-            result_thread.start()
-            result_thread.join(timeout=30)
-            
-            if result_thread.is_alive():
-                return JSONResponse(content={
-                    "answer": "Yanıt oluşturulurken zaman aşımı oluştu. Lütfen daha kısa bir soru sorun veya daha sonra tekrar deneyin.",
-                    "sources": []
-                })
-            
-            if hasattr(result_thread, "result"):
-                result = result_thread.result
-            else:
-                result = query_manager.ask(request.question)
-
-            # Convert Document objects to serializable format
-            source_documents = []
-            for doc in result.get("source_documents", []):
-                source_documents.append({
-                    "page_content": doc.page_content,
-                    "metadata": doc.metadata
-                })
-            
-            return JSONResponse(content={
-                "answer": result.get("answer", ""),
-                "sources": source_documents
-            })
-            
-        except Exception as query_error:
-            logger.exception(f"Error querying collection: {query_error}")
-            return JSONResponse(content={
-                "answer": f"Sorgunuz işlenirken bir hata oluştu: {str(query_error)}",
-                "sources": []
-            })
+        return await _answer_question(request.collection_name, request.question)
             
     except Exception as e:
         logger.exception(f"Error in ask_assistant endpoint: {e}")
-        return JSONResponse(status_code=500, content={"answer": "Beklenmeyen bir hata oluştu.", "sources": []})
+        return ORJSONResponse(status_code=500, content={"answer": "Beklenmeyen bir hata oluştu.", "sources": []})
+
+def _sse_event(event: str, data: Any) -> bytes:
+    """Format a single Server-Sent Events message."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+@app.post("/api/asistana-sor/stream")
+async def ask_assistant_stream(request: QuestionRequest, background_tasks: BackgroundTasks):
+    """
+    /api/asistana-sor as Server-Sent Events: `token` events with answer deltas, one `sources` event and `done`.
+    While the collection is not ready the reply is the same JSON body as /api/asistana-sor.
+    """
+    logger.info(f"Asking question (stream) to collection '{request.collection_name}': {request.question}")
 
+    if not GOOGLE_API_KEY_SET:
+        return ORJSONResponse(status_code=400, content={"answer": "Google API anahtarı bulunamadı.", "sources": []})
+
+    if await run_in_threadpool(_existing_collection_info, request.collection_name) is None:
+        background_tasks.add_task(ensure_collection_once, request.collection_name)
+        return ORJSONResponse(content={
+            "answer": "Bu eğitim için veritabanı hazırlanıyor. Bu işlem birkaç dakika sürebilir. Lütfen biraz bekledikten sonra tekrar sorunuzu sorun.",
+            "sources": [],
+            "status": "processing"
+        })
+
+    try:
+        query_manager = await run_in_threadpool(get_query_manager, request.collection_name)
+    except Exception as query_error:
+        logger.exception(f"Error querying collection: {query_error}")
+        return ORJSONResponse(content={
+            "answer": f"Sorgunuz işlenirken bir hata oluştu: {str(query_error)}",
+            "sources": []
+        })
+
+    async def event_stream():
+        stream = query_manager.ask_stream(request.question)
+        try:
+            while True:
+                # Each wait (retrieval plus first chunk, then every later chunk) is bounded, so a stalled
+                # retriever or Gemini stream cannot hold the connection and the worker forever.
+                try:
+                    event = await asyncio.wait_for(anext(stream), timeout=ASK_TIMEOUT_SECONDS)
+                except StopAsyncIteration:
+                    break
+                if "delta" in event:
+                    yield _sse_event("token", {"delta": event["delta"]})
+                else:
+                    yield _sse_event("sources", [
+                        {"page_content": doc.page_content, "metadata": doc.metadata}
+                        for doc in event["source_documents"]
+                    ])
+            yield _sse_event("done", {})
+        except asyncio.TimeoutError:
+            logger.error(f"Streaming answer timed out after {ASK_TIMEOUT_SECONDS} seconds.")
+            yield _sse_event("error", {"detail": "Yanıt oluşturulurken zaman aşımı oluştu. Lütfen daha kısa bir soru sorun veya daha sonra tekrar deneyin."})
+        except Exception as e:
+            logger.exception(f"Error streaming answer: {e}")
+            yield _sse_event("error", {"detail": f"Sorgunuz işlenirken bir hata oluştu: {str(e)}"})
+        finally:
+            await stream.aclose()
+
+    # identity keeps GZipMiddleware from buffering the events until its compression block fills
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "Content-Encoding": "identity"})
+
+# Plain def: the directory scans below block, so FastAPI runs this on its threadpool.
 @app.get("/api/check-collection/{collection_name}")
-async def check_collection(collection_name: str):
+def check_collection(collection_name: str):
     collection_path = get_collection_dir(collection_name)
     exists = is_valid_collection(collection_path)
     
@@ -389,7 +827,16 @@ async def check_collection(collection_name: str):
         if latest_uuid:
             response_data["uuid"] = latest_uuid
     
-    return JSONResponse(content=response_data)
+    return ORJSONResponse(content=response_data)
+
+class CollectionsCheckRequest(BaseModel):
+    names: List[str]
+
+@app.post("/api/check-collections")
+async def check_collections(request: CollectionsCheckRequest):
+    """Bulk /api/check-collection: {name: {exists, uuid}} from a single scan of the collections root."""
+    statuses = await run_in_threadpool(get_collection_statuses, request.names)
+    return ORJSONResponse(content=statuses)
 
 @app.post("/api/ensure-collection")
 async def ensure_collection_endpoint(request: Request, background_tasks: BackgroundTasks):
@@ -398,19 +845,13 @@ async def ensure_collection_endpoint(request: Request, background_tasks: Backgro
     if not collection_name:
         raise HTTPException(status_code=400, detail="collection_name is required")
     
-    collection_path = get_collection_dir(collection_name)
-    if is_valid_collection(collection_path):
-        latest_uuid = find_latest_collection_uuid(collection_path)
-        return JSONResponse(content={
-            "status": "exists",
-            "message": f"Collection '{collection_name}' already exists",
-            "collection_path": str(collection_path / latest_uuid) if latest_uuid else str(collection_path),
-            "collection_uuid": latest_uuid
-        })
+    existing = await run_in_threadpool(_existing_collection_info, collection_name)
+    if existing is not None:
+        return ORJSONResponse(content=existing)
     
-    background_tasks.add_task(ensure_collection_exists, collection_name)
+    background_tasks.add_task(ensure_collection_once, collection_name)
     
-    return JSONResponse(content={
+    return ORJSONResponse(content={
         "status": "processing",
         "message": f"Collection '{collection_name}' creation started in background",
         "collection_path": None
@@ -418,5 +859,5 @@ async def ensure_collection_endpoint(request: Request, background_tasks: Backgro
 
 if __name__ == "__main__":
     import uvicorn
-    logger.info(f"Starting SterkAgents with {len(VIDEO_LIST)} videos")
+    logger.info("Starting SterkAgents web service")
     uvicorn.run("web_api_service:app", host="0.0.0.0", port=5001, reload=True)